@@ -1,8 +1,11 @@
 from .bdmv import *  # noqa: F401, F403
 from .filterchain import *  # noqa: F401, F403
+from .fingerprint import *  # noqa: F401, F403
 from .indexer import *  # noqa: F401, F403
 from .parse import *  # noqa: F401, F403
+from .scheduler import *  # noqa: F401, F403
 from .utils import *  # noqa: F401, F403
+from .workqueue import *  # noqa: F401, F403
 
 try:
     # only import Encoder class if vardautomation is installed on the system
@@ -0,0 +1,159 @@
+"""
+Memory-mapped readers for MPLS and CLPI files. Only the fields used by svsfunc are decoded, directly from the mapped
+file without copying it. See https://github.com/lw/BluRay/wiki for the file formats.
+"""
+from __future__ import annotations
+
+import mmap
+from contextlib import contextmanager
+from pathlib import Path
+from struct import Struct
+from typing import Iterator, NamedTuple
+
+__all__ = ["MplsPlayItem", "MplsData", "ClpiSequence", "ClpiData", "read_mpls", "read_clpi"]
+
+_U8 = Struct(">B")
+_U16 = Struct(">H")
+_U32 = Struct(">I")
+_ADDRESSES = Struct(">II")
+_PLAY_ITEM = Struct(">HBII")       # misc flags, ref to STC id, intime, outtime
+_MARK = Struct(">xBHIxxxxxx")      # mark type, ref to play item id, timestamp
+_STC_SEQUENCE = Struct(">xxIII")   # SPN STC start, presentation start time, presentation end time
+
+_VIDEO_CODING_TYPES = {0x01, 0x02, 0x1B, 0x20, 0x24, 0xEA}
+
+
+class MplsPlayItem(NamedTuple):
+    clip: str
+    codec: str
+    intime: int
+    outtime: int
+    video_coding_type: int | None
+    video_format: int | None
+    video_framerate: int | None
+
+
+class MplsData(NamedTuple):
+    items: list[MplsPlayItem]
+    marks: list[tuple[int, int, int]]
+    """Mark type, ref to play item id and timestamp of every mark"""
+
+
+class ClpiSequence(NamedTuple):
+    spn_stc_start: int
+    presentation_start: int
+    presentation_end: int
+
+
+class ClpiData(NamedTuple):
+    source_packets: int
+    sequences: list[ClpiSequence]
+    video_coding_type: int | None
+    video_format: int | None
+    video_framerate: int | None
+
+
+@contextmanager
+def _map_file(path: Path) -> Iterator[mmap.mmap]:
+    with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+def _read_video_attributes(mapped: mmap.mmap, pos: int) -> tuple[int | None, int | None, int | None]:
+    # StreamAttributes/StreamCodingInfo: length, coding type, video format (4 bits) and framerate (4 bits)
+    coding_type, = _U8.unpack_from(mapped, pos + 1)
+    if coding_type not in _VIDEO_CODING_TYPES:
+        return coding_type, None, None
+
+    format_and_rate, = _U8.unpack_from(mapped, pos + 2)
+    return coding_type, format_and_rate >> 4, format_and_rate & 0x0F
+
+
+def read_mpls(path: Path) -> MplsData:
+    """
+    Read play items and playlist marks of a MPLS file.
+
+    :raises ValueError:     If the file is not a MPLS file or is truncated
+    """
+    with _map_file(path) as mapped:
+        if mapped[:4] != b"MPLS":
+            raise ValueError(f"read_mpls: {path} is not a MPLS file")
+
+        playlist_start, mark_start = _ADDRESSES.unpack_from(mapped, 8)
+
+        items = list[MplsPlayItem]()
+
+        if _U32.unpack_from(mapped, playlist_start)[0] != 0:
+            nb_items, = _U16.unpack_from(mapped, playlist_start + 6)
+            pos = playlist_start + 10
+
+            for _ in range(nb_items):
+                length, = _U16.unpack_from(mapped, pos)
+                clip = mapped[pos + 2:pos + 7].decode("ascii")
+                codec = mapped[pos + 7:pos + 11].decode("ascii")
+                flags, _, intime, outtime = _PLAY_ITEM.unpack_from(mapped, pos + 11)
+
+                stn_pos = pos + 34
+                if flags & (1 << 4):  # multi angle, the first angle is the item itself
+                    nb_angles, = _U8.unpack_from(mapped, stn_pos)
+                    stn_pos += 2 + 10 * (nb_angles - 1)
+
+                coding_type = video_format = framerate = None
+                if _U16.unpack_from(mapped, stn_pos)[0] != 0 and _U8.unpack_from(mapped, stn_pos + 4)[0] > 0:
+                    entry_pos = stn_pos + 16
+                    attributes_pos = entry_pos + _U8.unpack_from(mapped, entry_pos)[0] + 1
+                    coding_type, video_format, framerate = _read_video_attributes(mapped, attributes_pos)
+
+                items.append(MplsPlayItem(clip, codec, intime, outtime, coding_type, video_format, framerate))
+                pos += length + 2
+
+        marks = list[tuple[int, int, int]]()
+
+        if _U32.unpack_from(mapped, mark_start)[0] != 0:
+            nb_marks, = _U16.unpack_from(mapped, mark_start + 4)
+            marks = [_MARK.unpack_from(mapped, mark_start + 6 + i * _MARK.size) for i in range(nb_marks)]
+
+    return MplsData(items, marks)
+
+
+def read_clpi(path: Path) -> ClpiData:
+    """
+    Read the number of source packets, STC sequences and first video stream of a CLPI file.
+
+    :raises ValueError:     If the file is not a CLPI file or is truncated
+    """
+    with _map_file(path) as mapped:
+        if mapped[:4] != b"HDMV":
+            raise ValueError(f"read_clpi: {path} is not a CLPI file")
+
+        sequence_start, program_start = _ADDRESSES.unpack_from(mapped, 8)
+        source_packets, = _U32.unpack_from(mapped, 56)
+
+        sequences = list[ClpiSequence]()
+        nb_atc, = _U8.unpack_from(mapped, sequence_start + 5)
+        pos = sequence_start + 6
+
+        for _ in range(nb_atc):
+            nb_stc, = _U8.unpack_from(mapped, pos + 4)
+            pos += 6
+
+            for _ in range(nb_stc):
+                sequences.append(ClpiSequence(*_STC_SEQUENCE.unpack_from(mapped, pos)))
+                pos += _STC_SEQUENCE.size
+
+        nb_programs, = _U8.unpack_from(mapped, program_start + 5)
+        pos = program_start + 6
+
+        for _ in range(nb_programs):
+            nb_streams, = _U8.unpack_from(mapped, pos + 6)
+            pos += 8
+
+            for _ in range(nb_streams):
+                coding_type, video_format, framerate = _read_video_attributes(mapped, pos + 2)
+
+                if video_format is not None:
+                    return ClpiData(source_packets, sequences, coding_type, video_format, framerate)
+
+                pos += 3 + _U8.unpack_from(mapped, pos + 2)[0]
+
+    return ClpiData(source_packets, sequences, None, None, None)
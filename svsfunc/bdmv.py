@@ -1,17 +1,28 @@
 from __future__ import annotations
 
+import io
 import os
-from dataclasses import dataclass
+import pickle
+import struct
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from fractions import Fraction
+from collections import Counter
+from hashlib import blake2b
 from pathlib import Path
-from typing import Sequence
+from statistics import fmean, pstdev
+from typing import Any, Sequence
 
 from pyparsebluray import mpls
 from pytimeconv import Convert
 
+from ._bdreader import MplsData, MplsPlayItem, read_clpi, read_mpls
 from .utils import ensure_path
 
-__all__ = ["BDMV", "BdVolume", "MplsItem", "MplsFile"]
+__all__ = ["BDMV", "BdVolume", "MplsItem", "MplsFile", "MplsInfo", "ClipInfo"]
+
+# increase when the pickled classes change, caches written by other versions are ignored
+_SCAN_CACHE_VERSION = 1
 
 
 @dataclass
@@ -38,6 +49,82 @@ class BDMV:
         bd_volumes: list[BdVolume] = [vol for subdir in subdirs if (vol := cls._find_bd_volume(subdir)) is not None]
         return BDMV(path, bd_volumes)
 
+    @classmethod
+    def scan(cls, path: str | Path, workers: int | None = None, cache: bool | str | Path = True) -> "BDMV":
+        """
+        Searches subdirectories of the given path to find BD volumes and parse every playlist of every volume.
+        Volumes and playlists are parsed concurrently, and the result is saved to a cache file that is reused as long
+        as the modification times of the BDMV folder, its subfolders and the ``PLAYLIST``/``STREAM`` folders of every
+        volume do not change. Playlists that cannot be parsed are skipped.
+
+        :param path:        Path to the BDMV folder
+        :param workers:     Number of threads used to parse volumes and playlists. If None, uses Python's default.
+        :param cache:       Path to the cache file. If True, uses a file in ``~/.cache/svsfunc``. If False, the
+                            result is not cached. Defaults to True
+
+        :return:            BDMV object with every playlist already parsed
+        """
+        path = ensure_path(path, "BDMV.scan")
+
+        if cache is True:
+            cache_name = blake2b(str(path).encode(), digest_size=8).hexdigest()
+            cache_file: Path | None = Path.home() / ".cache" / "svsfunc" / f"bdmv_{cache_name}.pickle"
+        else:
+            cache_file = Path(cache) if cache else None
+
+        if cache_file is not None and (bdmv := cls._load_scan(cache_file)) is not None:
+            return bdmv
+
+        with ThreadPoolExecutor(workers, "BDMV.scan") as executor:
+            subdirs = [subdir for subdir in path.iterdir() if subdir.is_dir()]
+            bd_volumes = [vol for vol in executor.map(cls._find_bd_volume, subdirs) if vol is not None]
+
+            for bd_vol in bd_volumes:
+                bd_vol._parse_playlists(executor, skip_errors=True)
+
+        bdmv = BDMV(path, bd_volumes)
+
+        if cache_file is not None:
+            bdmv._save_scan(cache_file)
+
+        return bdmv
+
+    def _scan_key(self) -> dict[str, int] | None:
+        folders = [self.bdmv_folder] + [subdir for subdir in self.bdmv_folder.iterdir() if subdir.is_dir()]
+        for bd_vol in self.bd_volumes:
+            folders += [bd_vol.volume_path, bd_vol.mpls_folder, bd_vol.m2ts_folder]
+
+        try:
+            return {str(folder): folder.stat().st_mtime_ns for folder in folders}
+        except OSError:
+            return None
+
+    @classmethod
+    def _load_scan(cls, cache_file: Path) -> "BDMV" | None:
+        try:
+            with cache_file.open("rb") as file:
+                version, key, bdmv = pickle.load(file)
+        except Exception:
+            # unpickling can raise about anything on a corrupted cache or a cache of another version
+            return None
+
+        if version != _SCAN_CACHE_VERSION or not isinstance(bdmv, BDMV) or key is None or key != bdmv._scan_key():
+            return None
+
+        return bdmv
+
+    def _save_scan(self, cache_file: Path) -> None:
+        buffer = io.BytesIO()
+        _ScanPickler(buffer).dump((_SCAN_CACHE_VERSION, self._scan_key(), self))
+
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+            tmp_file.write_bytes(buffer.getvalue())
+            tmp_file.replace(cache_file)
+        except OSError:
+            pass
+
     @classmethod
     def from_volumes(
         cls, bd_volumes: Sequence[str | Path | "BdVolume"], bdmv_folder: str | Path | None = None
@@ -64,6 +151,40 @@ class BDMV:
 
         return BDMV(common_path, volumes)
 
+    def detect_episode_playlists(
+        self, duration_range: tuple[float, float] = (300, 3900), workers: int | None = None
+    ) -> list[int]:
+        """
+        Find the episode playlist of every BD volume using only the playlist headers.
+        See :py:meth:`BdVolume.rank_episode_playlists` for the ranking. If several playlists of a volume have the same
+        score, the id that was picked for the most volumes is used, then the lowest id.
+
+        :param duration_range:  Minimum and maximum duration of an episode in seconds, defaults to 5 to 65 minutes
+        :param workers:         Number of threads used to read the playlists. If None, uses Python's default.
+
+        :raises ValueError:     If no episode playlist is found in a volume
+
+        :return:                Id of the episode playlist of every volume
+        """
+        with ThreadPoolExecutor(workers, "BDMV.detect_episode_playlists") as executor:
+            rankings = list(executor.map(lambda vol: vol.rank_episode_playlists(duration_range), self.bd_volumes))
+
+        for bd_vol, ranking in zip(self.bd_volumes, rankings):
+            if not ranking:
+                raise ValueError(
+                    f"BDMV.detect_episode_playlists: no episode playlist found in volume {bd_vol.volume_path}"
+                )
+
+        picked = Counter(ranking[0][0].playlist_id for ranking in rankings)
+
+        return [
+            min(
+                (info.playlist_id for info, score in ranking if score == ranking[0][1]),
+                key=lambda x: (-picked[x], x)
+            )
+            for ranking in rankings
+        ]
+
     @classmethod
     def _find_bd_volume(cls, root_dir: Path) -> "BdVolume" | None:
         subdirs = [x.name for x in root_dir.iterdir() if x.is_dir()]
@@ -95,6 +216,8 @@ class BdVolume:
     m2ts_folder: Path
     """Path to the ``STREAM`` folder"""
 
+    _playlists: dict[int, "MplsFile"] = field(default_factory=dict, init=False, repr=False, compare=False)
+
     @classmethod
     def from_path(cls, path: str | Path) -> "BdVolume":
         """
@@ -127,25 +250,109 @@ class BdVolume:
 
         :return:                MplsFile object
         """
+        if playlist_idx in self._playlists:
+            return self._playlists[playlist_idx]
+
         playlist_id = str(playlist_idx).zfill(5)
         files = list(self.mpls_folder.glob(f"{playlist_id}.mpls"))
 
-        if len(files) < 0:
+        if len(files) == 0:
             raise ValueError(f"BdVolume.get_playlist: No playlist file found with id {playlist_id}.")
         elif len(files) > 1:
             raise ValueError(f"BdVolume.get_playlist: Multitple files found with id {playlist_id}.")
         else:
             playlist_file = files[0]
 
-        return MplsFile.parse(playlist_file, self.m2ts_folder)
+        return self._playlists.setdefault(playlist_idx, MplsFile.parse(playlist_file, self.m2ts_folder))
 
-    def get_playlists(self) -> list["MplsFile"]:
+    def get_playlists(self, workers: int | None = 1) -> list["MplsFile"]:
         """
         Get every playlist of this BD volume
 
-        :return: List of playlist of this BD volume
+        :param workers:     Number of threads used to parse the playlists. If None, uses Python's default.
+                            Defaults to 1
+
+        :return:            List of playlist of this BD volume, sorted by id
+        """
+        with ThreadPoolExecutor(workers, "BdVolume.get_playlists") as executor:
+            return self._parse_playlists(executor)
+
+    @property
+    def clpi_folder(self) -> Path:
+        """Path to the ``CLIPINF`` folder"""
+        return self.m2ts_folder.parent / "CLIPINF"
+
+    def list_playlists(self, workers: int | None = 1, skip_errors: bool = False) -> list["MplsInfo"]:
         """
-        return [MplsFile.parse(file, self.m2ts_folder) for file in self.mpls_folder.glob("*.mpls")]
+        Get the header of every playlist of this BD volume (play items and playlist marks only).
+        Much faster than :py:meth:`get_playlists` since only the fields used by svsfunc are decoded and M2TS files are
+        not checked. Use :py:attr:`MplsInfo.mpls` to fully parse a playlist.
+
+        :param workers:         Number of threads used to read the playlists. If None, uses Python's default.
+                                Defaults to 1
+        :param skip_errors:     Leave out the playlists that can't be read instead of raising. Defaults to False
+
+        :raises ValueError:     If a playlist can't be read and ``skip_errors`` is False
+
+        :return:                List of playlist headers of this BD volume, sorted by id
+        """
+        files = sorted(self.mpls_folder.glob("*.mpls"))
+
+        def _read(file: Path) -> MplsInfo | None:
+            try:
+                return MplsInfo.read(file, self.m2ts_folder)
+            except (OSError, ValueError):
+                if not skip_errors:
+                    raise
+                return None
+
+        if workers == 1:
+            infos = [_read(file) for file in files]
+        else:
+            with ThreadPoolExecutor(workers, "BdVolume.list_playlists") as executor:
+                infos = list(executor.map(_read, files))
+
+        return [info for info in infos if info is not None]
+
+    def rank_episode_playlists(
+        self, duration_range: tuple[float, float] = (300, 3900)
+    ) -> list[tuple["MplsInfo", float]]:
+        """
+        Rank the playlists of this BD volume by their likelihood of being the episode playlist, using only the
+        playlist headers. The score of a playlist increases with its number of episode-length items and decreases if:
+
+        * items have different durations
+        * items have too few or too many chapters
+        * items are shorter or longer than an episode (menus, "play all" playlists, ...)
+        * the same M2TS file is used by multiple items
+
+        :param duration_range:  Minimum and maximum duration of an episode in seconds, defaults to 5 to 65 minutes
+
+        :return:                List of playlist headers and their score, best playlist first.
+                                Playlists with a score of 0 and playlists that can't be read are not included.
+        """
+        ranking = [
+            (info, score) for info in self.list_playlists(skip_errors=True)
+            if (score := _episode_score(info, duration_range))
+        ]
+        return sorted(ranking, key=lambda x: (-x[1], x[0].playlist_id))
+
+    def _parse_playlists(self, executor: Executor, skip_errors: bool = False) -> list["MplsFile"]:
+        files = [file for file in sorted(self.mpls_folder.glob("*.mpls")) if int(file.stem) not in self._playlists]
+
+        def _parse(file: Path) -> MplsFile | None:
+            try:
+                return MplsFile.parse(file, self.m2ts_folder)
+            except ValueError:
+                if not skip_errors:
+                    raise
+                return None
+
+        for file, mpls_file in zip(files, executor.map(_parse, files)):
+            if mpls_file is not None:
+                self._playlists[int(file.stem)] = mpls_file
+
+        return [self._playlists[idx] for idx in sorted(self._playlists)]
 
 
 @dataclass
@@ -178,6 +385,8 @@ class MplsFile:
         m2ts_folder = ensure_path(m2ts_folder, "MplsFile.parse")
 
         # taken from vardautomation and modified
+        # pyparsebluray is kept here since MplsItem exposes its PlayItem and PlaylistMark objects, headers of
+        # playlists that only need to be listed or ranked are read with the memory-mapped reader (MplsInfo.read)
         with mpls_file.open('rb') as file:
             header = mpls.load_movie_playlist(file)
 
@@ -193,6 +402,14 @@ class MplsFile:
             if marks is None:
                 raise ValueError(f"MplsFile.parse: File {mpls_file} does not have playlist marks")
 
+        # all marks associated with each item, sorted by timestamp
+        marks_by_item = dict[int, list[mpls.PlaylistMark]]()
+        for mark in marks:
+            marks_by_item.setdefault(mark.ref_to_play_item_id, []).append(mark)
+
+        for item_marks in marks_by_item.values():
+            item_marks.sort(key=lambda x: x.mark_timestamp)
+
         mpls_items = list[MplsItem]()
         for i, item in enumerate(items):
             # get item path
@@ -204,11 +421,7 @@ class MplsFile:
 
             file_path = ensure_path(m2ts_folder / f"{file_name}.{file_ext}", "MplsFile.parse")
 
-            # all marks associated with the current file, sorted by timestamp
-            item_marks = sorted(
-                [mark for mark in marks if mark.ref_to_play_item_id == i],
-                key=lambda x: x.mark_timestamp
-            )
+            item_marks = marks_by_item.get(i, [])
 
             # offset from start of bd to start of current item
             if item.intime is None:
@@ -217,7 +430,6 @@ class MplsFile:
             offset = item.intime if not item_marks else min(item_marks[0].mark_timestamp, item.intime)
 
             # Extract the fps and store it
-            item_chapters = list[int]()
             if not (
                 item.stn_table and item.stn_table.length != 0 and                      # stn table is present
                 item.stn_table.prim_video_stream_entries and                           # stn table has video streams
@@ -231,15 +443,14 @@ class MplsFile:
             # find item fps
             try:
                 fps = mpls.FRAMERATE[fps_n]
-            except AttributeError:
+            except KeyError:
                 raise ValueError(
                     f"MplsFile.parse: Unknown framerate {fps_n} for item {item.clip_information_filename} of " +
                     f"file {mpls_file}."
                 )
 
             # get chapters
-            for item_mark in item_marks:
-                item_chapters.append(Convert.seconds2f((item_mark.mark_timestamp - offset) / 45000, fps))
+            item_chapters = _ticks_to_frames([mark.mark_timestamp - offset for mark in item_marks], fps)
 
             chapter = MplsItem(file_path, item_chapters, fps, item, item_marks)
             mpls_items.append(chapter)
@@ -247,6 +458,162 @@ class MplsFile:
         return MplsFile(mpls_file.resolve(), mpls_items)
 
 
+@dataclass
+class MplsInfo:
+    """
+    Header of a MPLS file: clips, in/out times and playlist marks of its play items.
+    The playlist is only fully parsed when :py:attr:`mpls` is accessed.
+    """
+
+    mpls_file: Path
+    """Path to this mpls file"""
+
+    m2ts_folder: Path
+    """Path to the ``STREAM`` folder"""
+
+    clips: list[str]
+    """Clip name of every play item (name of the M2TS file without extension)"""
+
+    in_times: list[int]
+    """In time of every play item, in 45 kHz ticks"""
+
+    out_times: list[int]
+    """Out time of every play item, in 45 kHz ticks"""
+
+    marks: list[tuple[int, int]]
+    """Playlist marks of this playlist, as tuple of play item id and timestamp in 45 kHz ticks"""
+
+    framerates: list[Fraction | None]
+    """Framerate of the first video stream of every play item, None if unknown"""
+
+    _mpls: "MplsFile" | None = field(default=None, init=False, repr=False, compare=False)
+    _clip_infos: list["ClipInfo"] | None = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def read(cls, mpls_file: str | Path, m2ts_folder: str | Path) -> "MplsInfo":
+        """
+        Read the header of a playlist file. The file is memory-mapped and only the fields used by svsfunc are decoded.
+        Falls back on pyparsebluray if the file layout is unusual.
+
+        :param mpls_file:       Path to the MPLS file to read
+        :param m2ts_folder:     Path to the ``STREAM`` folder of the BDMV
+
+        :raises ValueError:     If the file is not a MPLS file or can't be read (empty, truncated, ...)
+
+        :return:                MplsInfo object
+        """
+        mpls_file = ensure_path(mpls_file, "MplsInfo.read")
+
+        try:
+            data = read_mpls(mpls_file)
+        except (struct.error, UnicodeDecodeError):
+            # pyparsebluray raises many types of exceptions on malformed files
+            try:
+                data = _read_mpls_fallback(mpls_file)
+            except Exception as e:
+                raise ValueError(f"MplsInfo.read: {mpls_file} can't be read") from e
+
+        return MplsInfo(
+            mpls_file, ensure_path(m2ts_folder, "MplsInfo.read"),
+            [item.clip for item in data.items],
+            [item.intime for item in data.items],
+            [item.outtime for item in data.items],
+            [(item_id, timestamp) for _, item_id, timestamp in data.marks],
+            [mpls.FRAMERATE.get(item.video_framerate) if item.video_framerate else None for item in data.items]
+        )
+
+    @property
+    def playlist_id(self) -> int:
+        """Id of this playlist"""
+        return int(self.mpls_file.stem)
+
+    @property
+    def item_count(self) -> int:
+        """Number of play items"""
+        return len(self.clips)
+
+    @property
+    def item_durations(self) -> list[Fraction]:
+        """Duration of every play item in seconds"""
+        return [Fraction(out_t - in_t, 45000) for in_t, out_t in zip(self.in_times, self.out_times)]
+
+    @property
+    def duration(self) -> Fraction:
+        """Duration of the playlist in seconds"""
+        return sum(self.item_durations, Fraction(0))
+
+    @property
+    def mpls(self) -> "MplsFile":
+        """Fully parsed playlist, parsed on first access"""
+        if self._mpls is None:
+            self._mpls = MplsFile.parse(self.mpls_file, self.m2ts_folder)
+
+        return self._mpls
+
+    @property
+    def clip_infos(self) -> list["ClipInfo"]:
+        """Clip information of every play item, read from the ``CLIPINF`` folder on first access"""
+        if self._clip_infos is None:
+            clpi_folder = self.m2ts_folder.parent / "CLIPINF"
+            self._clip_infos = [
+                ClipInfo.read(_find_clpi(clpi_folder, clip, "MplsInfo.clip_infos")) for clip in self.clips
+            ]
+
+        return self._clip_infos
+
+
+@dataclass
+class ClipInfo:
+    """Information of a M2TS file, read from its CLPI file"""
+
+    clpi_file: Path
+    """Path to the CLPI file"""
+
+    source_packets: int
+    """Number of source packets of the M2TS file"""
+
+    presentation_start: int
+    """Presentation start time of the clip, in 45 kHz ticks"""
+
+    presentation_end: int
+    """Presentation end time of the clip, in 45 kHz ticks"""
+
+    framerate: Fraction | None
+    """Framerate of the first video stream, None if unknown"""
+
+    @classmethod
+    def read(cls, clpi_file: str | Path) -> "ClipInfo":
+        """
+        Read a CLPI file. The file is memory-mapped and only the fields used by svsfunc are decoded.
+
+        :param clpi_file:       Path to the CLPI file
+
+        :raises ValueError:     If the file is not a valid CLPI file
+
+        :return:                ClipInfo object
+        """
+        clpi_file = ensure_path(clpi_file, "ClipInfo.read")
+
+        try:
+            data = read_clpi(clpi_file)
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"ClipInfo.read: could not read {clpi_file}") from e
+
+        if not data.sequences:
+            raise ValueError(f"ClipInfo.read: {clpi_file} does not have any STC sequence")
+
+        return ClipInfo(
+            clpi_file, data.source_packets,
+            data.sequences[0].presentation_start, data.sequences[-1].presentation_end,
+            mpls.FRAMERATE.get(data.video_framerate) if data.video_framerate else None
+        )
+
+    @property
+    def duration(self) -> Fraction:
+        """Duration of the clip in seconds"""
+        return Fraction(self.presentation_end - self.presentation_start, 45000)
+
+
 @dataclass
 class MplsItem:
     """Reprensent an item of a MPLS file."""
@@ -269,6 +636,53 @@ class MplsItem:
     for more info.
     """
 
+    _clip_info: ClipInfo | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def duration(self) -> Fraction:
+        """Duration of the part of the M2TS file played by this item (from in time to out time), in seconds"""
+        intime, outtime = self._in_out_times
+        return Fraction(outtime - intime, 45000)
+
+    @property
+    def frame_count(self) -> int:
+        """Number of frames played by this item (from in time to out time)"""
+        intime, outtime = self._in_out_times
+        return _ticks_to_frames([outtime - intime], self.framerate)[0]
+
+    @property
+    def _in_out_times(self) -> tuple[int, int]:
+        if self.item_data.intime is None or self.item_data.outtime is None:
+            raise ValueError(f"MplsItem: Could not locate in/out times of item {self.m2ts_file.name}")
+
+        return self.item_data.intime, self.item_data.outtime
+
+    @property
+    def clip_info(self) -> ClipInfo:
+        """Information of the M2TS file of this item, read from the ``CLIPINF`` folder on first access"""
+        if self._clip_info is None:
+            clpi_folder = self.m2ts_file.parent.parent / "CLIPINF"
+            self._clip_info = ClipInfo.read(_find_clpi(clpi_folder, self.m2ts_file.stem, "MplsItem.clip_info"))
+
+        return self._clip_info
+
+    @property
+    def clip_frame_count(self) -> int:
+        """Number of frames of the whole M2TS file (what an indexer returns), computed from the clip information"""
+        clip_info = self.clip_info
+        return _ticks_to_frames([clip_info.presentation_end - clip_info.presentation_start], self.framerate)[0]
+
+    @property
+    def frame_range(self) -> tuple[int, int]:
+        """
+        Range of the frames of the M2TS file played by this item (first frame and last frame, inclusive),
+        computed from the playlist in/out times and the clip information.
+        """
+        start = self.clip_info.presentation_start
+        intime, outtime = self._in_out_times
+        first, end = _ticks_to_frames([intime - start, outtime - start], self.framerate)
+        return first, end - 1
+
     def chapters_timestamp(self, precison: int = 3) -> list[str]:
         """
         Get the chapters in timestamp format (HH:mm:ss.xxx)
@@ -278,3 +692,92 @@ class MplsItem:
         :return:            List of timestamps
         """
         return [Convert.f2ts(chapter, self.framerate, precision=precison) for chapter in self.chapters]
+
+
+def _find_clpi(clpi_folder: Path, clip: str, source: str) -> Path:
+    for ext in ("clpi", "CLPI"):
+        if (clpi_file := clpi_folder / f"{clip}.{ext}").exists():
+            return clpi_file
+
+    raise ValueError(f"{source}: no CLPI file found for clip {clip} in {clpi_folder}")
+
+
+def _read_mpls_fallback(mpls_file: Path) -> MplsData:
+    with mpls_file.open("rb") as file:
+        header = mpls.load_movie_playlist(file)
+
+        file.seek(header.playlist_start_address, os.SEEK_SET)
+        play_items = mpls.load_playlist(file).play_items or []
+
+        file.seek(header.playlist_mark_start_address, os.SEEK_SET)
+        marks = mpls.load_playlist_mark(file).playlist_marks or []
+
+    items = list[MplsPlayItem]()
+    for item in play_items:
+        video = item.stn_table.prim_video_stream_entries if item.stn_table and item.stn_table.length else None
+        attributes = video[0][1] if video else None
+
+        coding_type = video_format = framerate = None
+        if attributes is not None:
+            coding_type, video_format, framerate = (
+                attributes.stream_coding_type, attributes.video_format, attributes.framerate
+            )
+
+        items.append(MplsPlayItem(
+            item.clip_information_filename or "", item.clip_codec_identifier or "", item.intime or 0,
+            item.outtime or 0, coding_type, video_format, framerate
+        ))
+
+    return MplsData(items, [(mark.mark_type, mark.ref_to_play_item_id, mark.mark_timestamp) for mark in marks])
+
+
+def _ticks_to_frames(ticks: list[int], fps: Fraction) -> list[int]:
+    # round(ticks / 45000 * fps) using exact integer arithmetic
+    num, den = fps.numerator, fps.denominator * 45000
+
+    frames = list[int]()
+    for tick in ticks:
+        frame, rem = divmod(tick * num, den)
+
+        if 2 * rem == den:
+            # exact half frame, keep the float rounding of Convert.seconds2f
+            frames.append(Convert.seconds2f(tick / 45000, fps))
+        else:
+            frames.append(frame + (2 * rem > den))
+
+    return frames
+
+
+def _episode_score(info: MplsInfo, duration_range: tuple[float, float]) -> float:
+    durations = [float(d) for d in info.item_durations]
+    min_duration, max_duration = duration_range
+
+    episodes = [i for i, d in enumerate(durations) if min_duration <= d <= max_duration]
+    if not episodes:
+        return 0.0
+
+    ep_durations = [durations[i] for i in episodes]
+
+    # episodes have roughly the same duration, menus and extras don't
+    in_range = len(episodes) / len(durations)
+    clustering = 1 / (1 + 10 * pstdev(ep_durations) / fmean(ep_durations))
+
+    # episodes usually have a few chapters each, but some BD don't have chapters at all
+    chapter_count = Counter(item_id for item_id, _ in info.marks)
+    chapters = 0.5 + 0.5 * sum(2 <= chapter_count[i] <= 12 for i in episodes) / len(episodes)
+
+    uniqueness = len(set(info.clips)) / len(info.clips)
+
+    return len(episodes) * in_range * clustering * chapters * uniqueness
+
+
+def _closed_file() -> None:
+    return None
+
+
+class _ScanPickler(pickle.Pickler):
+    # pyparsebluray objects keep a reference to the (closed) file they were loaded from
+    def reducer_override(self, obj: Any) -> Any:
+        if isinstance(obj, io.IOBase):
+            return _closed_file, ()
+        return NotImplemented
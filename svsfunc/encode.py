@@ -102,6 +102,14 @@ class Encoder(VideoTooling, AudioTooling, ChapterTooling, UtilsTooling):
         if self.v_encoder is None:
             raise TypeError("Encoder.run: no video encoder set")
 
+        if self.chunked:
+            if self.v_lossless_encoder is not None:
+                raise ValueError("Encoder.run: chunked encode cannot be used with a lossless encoder")
+
+            # the runner skips the video encode since the output exists
+            if not self.file.name_clip_output.exists():
+                self.encode_video_chunks()
+
         config = RunnerConfig(
             v_encoder=self.v_encoder,
             v_lossless_encoder=self.v_lossless_encoder,
@@ -117,7 +125,8 @@ class Encoder(VideoTooling, AudioTooling, ChapterTooling, UtilsTooling):
         if self.post_filterchain_func is not None:
             self.runner.plp_function = self.post_filterchain_func
 
-        if self.qp_file is not None:
+        # chunks write their qpfile from the keyframes of the split, the runner does not encode the video
+        if self.qp_file is not None and not self.chunked:
             self.runner.inject_qpfile_params(self.qp_file)
 
         self.runner.run()
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import os
+import sys
+from array import array
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future
+from hashlib import blake2b
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterator, NamedTuple, Sequence
+from weakref import WeakKeyDictionary
+
+from vstools import core, vs
+
+from .indexer import EpisodeInfo, file_fingerprint, get_index_cache
+
+__all__ = [
+    "frame_fingerprints", "find_clip",
+    "FrameMatch", "get_fingerprints", "match_ranges", "find_offset"
+]
+
+# every frame is reduced to a 9x8 luma thumbnail, each bit of the fingerprint compares two neighbouring pixels
+_THUMB_WIDTH, _THUMB_HEIGHT = 9, 8
+
+# version of the fingerprint algorithm, saved fingerprints of other versions are rebuilt
+_FINGERPRINT_VERSION = 1
+_FINGERPRINT_MAGIC = b"SVFP"
+
+
+def _iter_frames(clip: vs.VideoNode) -> Iterator[vs.VideoFrame]:
+    # frames are requested ahead so that they are rendered in parallel, but returned in order
+    window = max(core.num_threads, 1) * 2
+    requests = deque[Future[vs.VideoFrame]]()
+
+    for n in range(clip.num_frames):
+        requests.append(clip.get_frame_async(n))
+
+        if len(requests) > window:
+            yield requests.popleft().result()
+
+    while requests:
+        yield requests.popleft().result()
+
+
+def _hash_thumbnail(pixels: bytes) -> int:
+    fingerprint = 0
+
+    for y in range(_THUMB_HEIGHT):
+        row = pixels[y * _THUMB_WIDTH:(y + 1) * _THUMB_WIDTH]
+        for x in range(_THUMB_WIDTH - 1):
+            fingerprint = (fingerprint << 1) | (row[x] < row[x + 1])
+
+    return fingerprint
+
+
+def frame_fingerprints(clip: vs.VideoNode) -> array[int]:
+    """
+    Compute a 64 bits perceptual hash of every frame (difference hash of a tiny luma thumbnail).
+    Frames are streamed, only a few of them are kept in memory at the same time.
+    Similar frames have fingerprints with a small number of different bits, even with credits or different encodes.
+
+    :param clip:    Clip to fingerprint
+
+    :return:        Fingerprint of every frame
+    """
+    thumb = clip.resize.Bilinear(_THUMB_WIDTH, _THUMB_HEIGHT, format=vs.GRAY8)
+    fingerprints = array("Q")
+
+    for frame in _iter_frames(thumb):
+        with frame:
+            fingerprints.append(_hash_thumbnail(frame[0].tobytes()))  # type: ignore[index]
+
+    return fingerprints
+
+
+def _distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def find_clip(
+    haystack: Sequence[int], needle: Sequence[int], threshold: int = 10, anchors: int = 32
+) -> tuple[int, int] | None:
+    """
+    Find where a clip is in another clip from their fingerprints (see :py:func:`frame_fingerprints`).
+    Anchor frames of the needle vote for the offsets of the frames of the haystack that look like them, then the best
+    offset is refined to the frame by comparing every frame of the needle with the haystack.
+
+    :param haystack:    Fingerprints of the clip to search in (e.g. an episode)
+    :param needle:      Fingerprints of the clip to search (e.g. a NCOP)
+    :param threshold:   Maximum number of different bits for two frames to match, defaults to 10
+    :param anchors:     Number of needle frames used to find the candidate offsets, defaults to 32
+
+    :return:            First and last frames (inclusive) of the haystack aligned with the first and last frames of
+                        the needle (clamped to the haystack), or None if the needle was not found.
+    """
+    if not haystack or not needle:
+        return None
+
+    # flat frames (black, white) have empty fingerprints and would match everywhere
+    candidates = [i for i in range(len(needle)) if 8 <= needle[i].bit_count() <= 56] or list(range(len(needle)))
+    step = max(len(candidates) // anchors, 1)
+
+    votes = Counter[int]()
+    for i in candidates[::step]:
+        votes.update(j - i for j, fingerprint in enumerate(haystack) if _distance(fingerprint, needle[i]) <= threshold)
+
+    best: tuple[int, int] | None = None
+
+    for offset, _ in votes.most_common(3):
+        for shift in range(-2, 3):
+            matched = sum(
+                _distance(haystack[offset + shift + i], needle[i]) <= threshold
+                for i in range(max(0, -(offset + shift)), min(len(needle), len(haystack) - offset - shift))
+            )
+
+            if matched and (best is None or matched > best[0]):
+                best = (matched, offset + shift)
+
+    # half of the needle must match, the other half may be hidden by credits or cut
+    if best is None or best[0] * 2 < len(needle):
+        return None
+
+    # the range is aligned with the whole needle, so that it has the same frames as the NC even if its first or last
+    # frames do not match (title overlay, crossfade)
+    offset = best[1]
+    return max(offset, 0), min(offset + len(needle), len(haystack)) - 1
+
+
+class FrameMatch(NamedTuple):
+    """Ranges (inclusive) of two clips that have the same content"""
+
+    reference: tuple[int, int]
+    """Range in the reference clip"""
+
+    clip: tuple[int, int]
+    """Range in the other clip"""
+
+    @property
+    def offset(self) -> int:
+        """Offset to add to a frame of the other clip to get the same frame in the reference clip"""
+        return self.reference[0] - self.clip[0]
+
+    @property
+    def length(self) -> int:
+        """Number of frames of the ranges"""
+        return self.clip[1] - self.clip[0] + 1
+
+
+_episode_fingerprints: WeakKeyDictionary[EpisodeInfo[Any], array[int]] = WeakKeyDictionary()
+_episode_lock = Lock()
+
+
+def _get_fingerprints_path(episode: EpisodeInfo[Any], clip: vs.VideoNode) -> tuple[Path, bytes]:
+    settings = dict(
+        source=file_fingerprint(episode.path), num_frames=clip.num_frames, width=clip.width, height=clip.height,
+        version=_FINGERPRINT_VERSION
+    )
+
+    if (store := get_index_cache()) is not None:
+        path = store.get_path(episode.path, "Fingerprint", settings, ".fp")
+    else:
+        path = episode.path.with_suffix(".fp")
+
+    # the header identifies the source file and the clip, since the file next to the source is shared by every trim
+    # of the source and is kept if the source is replaced (e.g. re-rip)
+    return path, _FINGERPRINT_MAGIC + blake2b(repr(sorted(settings.items())).encode(), digest_size=16).digest()
+
+
+def _load_fingerprints(path: Path, header: bytes) -> array[int] | None:
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+
+    if not data.startswith(header) or (len(data) - len(header)) % 8:
+        return None
+
+    fingerprints = array("Q", data[len(header):])
+    if sys.byteorder == "big":
+        fingerprints.byteswap()
+
+    return fingerprints
+
+
+def _save_fingerprints(path: Path, header: bytes, fingerprints: array[int]) -> None:
+    if sys.byteorder == "big":
+        fingerprints = array("Q", fingerprints)
+        fingerprints.byteswap()
+
+    try:
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(header + fingerprints.tobytes())
+        tmp_path.replace(path)
+    except OSError:  # read-only folder (e.g. mounted BD), fingerprints are computed again next time
+        pass
+
+
+def get_fingerprints(clip: vs.VideoNode | EpisodeInfo[Any], cache: bool = True) -> array[int]:
+    """
+    Get the fingerprints of every frame of a clip (see :py:func:`frame_fingerprints`).
+    Fingerprints of an episode are saved to a ``.fp`` file in the index cache folder (see
+    :py:func:`svsfunc.indexer.set_index_cache`) or next to the source file, and kept in memory as long as the
+    episode exists.
+
+    :param clip:    Clip or episode to fingerprint
+    :param cache:   Load and save the fingerprints of an episode, defaults to True
+
+    :return:        Fingerprints of every frame (8 bytes per frame)
+    """
+    if isinstance(clip, vs.VideoNode):
+        return frame_fingerprints(clip)
+
+    episode = clip
+
+    with _episode_lock:
+        if cache and (fingerprints := _episode_fingerprints.get(episode)) is not None:
+            return fingerprints
+
+    node = episode.clip
+    path, header = _get_fingerprints_path(episode, node)
+
+    loaded = _load_fingerprints(path, header) if cache else None
+    if loaded is not None and len(loaded) == node.num_frames:
+        fingerprints = loaded
+    else:
+        fingerprints = frame_fingerprints(node)
+        if cache:
+            _save_fingerprints(path, header, fingerprints)
+
+    with _episode_lock:
+        _episode_fingerprints[episode] = fingerprints
+
+    return fingerprints
+
+
+def match_ranges(
+    reference: vs.VideoNode | EpisodeInfo[Any] | Sequence[int], clip: vs.VideoNode | EpisodeInfo[Any] | Sequence[int],
+    threshold: int = 10, min_length: int = 24, max_gap: int = 12
+) -> list[FrameMatch]:
+    """
+    Find every range of a clip that is also in a reference clip, e.g. a TV broadcast and the BD, or a recap and the
+    previous episode. Ranges can have different offsets (cut or moved scenes).
+
+    Frames of the reference clip are indexed by the four 16 bits parts of their fingerprint, so that every frame of
+    the other clip is only compared with a few frames of the reference. Every match votes for an offset, then frames
+    are compared one by one for the most voted offsets to find the matching ranges.
+
+    :param reference:   Reference clip, episode or fingerprints
+    :param clip:        Other clip, episode or fingerprints
+    :param threshold:   Maximum number of different bits for two frames to match, defaults to 10
+    :param min_length:  Minimum number of frames of a range, defaults to 24
+    :param max_gap:     Maximum number of frames that do not match inside a range (e.g. a changed sign),
+                        defaults to 12
+
+    :return:            Matching ranges sorted by their position in the other clip
+    """
+    ref_fps = reference if isinstance(reference, Sequence) else get_fingerprints(reference)
+    clip_fps = clip if isinstance(clip, Sequence) else get_fingerprints(clip)
+
+    # parts shared by a lot of frames (static or flat scenes) do not tell anything about the offset
+    max_bucket = 64
+    buckets = defaultdict[tuple[int, int], list[int]](list)
+
+    for j, fingerprint in enumerate(ref_fps):
+        if 8 <= fingerprint.bit_count() <= 56:
+            for band in range(4):
+                buckets[(band, (fingerprint >> (16 * band)) & 0xFFFF)].append(j)
+
+    votes = Counter[int]()
+
+    for i, fingerprint in enumerate(clip_fps):
+        offsets = set[int]()
+
+        for band in range(4):
+            positions = buckets.get((band, (fingerprint >> (16 * band)) & 0xFFFF), ())
+            if len(positions) <= max_bucket:
+                offsets.update(j - i for j in positions if _distance(ref_fps[j], fingerprint) <= threshold)
+
+        votes.update(offsets)
+
+    matches = list[FrameMatch]()
+    assigned = bytearray(len(clip_fps))
+
+    for offset, count in votes.most_common(64):
+        if count < max(min_length // 4, 2):
+            break
+
+        first, last = max(0, -offset), min(len(clip_fps), len(ref_fps) - offset)
+        start = end = -1
+
+        for i in range(first, last + 1):
+            if i < last and not assigned[i] and _distance(ref_fps[i + offset], clip_fps[i]) <= threshold:
+                start = i if start < 0 else start
+                end = i
+            elif start >= 0 and (i == last or assigned[i] or i - end > max_gap):
+                if end - start + 1 >= min_length:
+                    matches.append(FrameMatch((start + offset, end + offset), (start, end)))
+                    assigned[start:end + 1] = b"\x01" * (end - start + 1)
+                start = end = -1
+
+    return sorted(matches, key=lambda match: match.clip)
+
+
+def find_offset(
+    reference: vs.VideoNode | EpisodeInfo[Any] | Sequence[int], clip: vs.VideoNode | EpisodeInfo[Any] | Sequence[int],
+    threshold: int = 10
+) -> int | None:
+    """
+    Find the offset between two clips with the same content, e.g. to sync a TV broadcast with the BD.
+    Frame `n` of the clip is frame `n + offset` of the reference.
+
+    :param reference:   Reference clip, episode or fingerprints
+    :param clip:        Other clip, episode or fingerprints
+    :param threshold:   Maximum number of different bits for two frames to match, defaults to 10
+
+    :return:            Offset of the longest matching range, None if the clips have no common range
+    """
+    matches = match_ranges(reference, clip, threshold)
+
+    return max(matches, key=lambda match: match.length).offset if matches else None
@@ -1,5 +1,6 @@
 from .abstract import *  # noqa: F401, F403
 from .audio import *  # noqa: F401, F403
+from .cache import *  # noqa: F401, F403
 from .episode_info import *  # noqa: F401, F403
 from .src_file import *  # noqa: F401, F403
 from .video import *  # noqa: F401, F403
@@ -1,12 +1,18 @@
+import multiprocessing
+import os
 from abc import ABC
-from dataclasses import dataclass, field, replace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, fields, replace
+from functools import partial
+from itertools import repeat
 from pathlib import Path
-from typing import Any, Callable, Generic, NamedTuple, TypeVar, overload
+from typing import Any, Callable, Generic, Literal, NamedTuple, Sequence, TypeVar, overload
 
-from vstools import copy_signature
+from vstools import copy_signature, core
 
 from ..custom_types import IndexedT, PathLike
 from ..utils import ensure_path
+from .cache import IndexCacheStore, file_fingerprint, get_index_cache, is_index_valid, write_index_meta
 
 __all__ = ["Indexer", "IndexerCache"]
 
@@ -16,6 +22,10 @@ T = TypeVar("T")
 class IndexerCache(NamedTuple):
     arg_name: str
     ext: str
+    namespace: str | None = None
+    """Namespace of the plugin that writes the index file, used to invalidate index files when the plugin is updated"""
+    settings: tuple[str, ...] | None = None
+    """Settings that affect the content of the index file. If None, every setting is considered."""
 
 
 @dataclass
@@ -23,6 +33,12 @@ class Indexer(ABC, Generic[IndexedT]):
     _index_func: Callable[[Path], IndexedT] = field(init=False, repr=False)
     _cache: IndexerCache | None = field(init=False, repr=False, default=None)
 
+    cache_store: IndexCacheStore | None = field(default=None, kw_only=True, repr=False)
+    """
+    Folder where the index files are stored. If None, uses the default store (see :py:func:`set_index_cache`) or
+    writes the index file next to the source file if no default store is set.
+    """
+
     def _get_kwargs(self, default: dict[str, Any] | None = None) -> dict[str, Any]:
         kwargs: dict[str, Any] = {key: self.__dict__.get(key) for key in self.__match_args__}  # type: ignore
         if default:
@@ -47,12 +63,127 @@ class Indexer(ABC, Generic[IndexedT]):
         :return:        Indexed file
         """
         if isinstance(source_file, list):
-            return [self.index(ensure_path(p), **indexer_overrides) for p in source_file]
+            return self.index_batch(source_file, **indexer_overrides)
 
         path = ensure_path(source_file, f"{self.__class__.__name__}.index")
-        cache = {self._cache.arg_name: str(path.with_suffix(self._cache.ext))} if self._cache else None
 
-        return self._index_func(path, **(self._get_kwargs(cache) | indexer_overrides))
+        if self._cache is None or self._cache.arg_name in indexer_overrides:
+            return self._index_func(path, **(self._get_kwargs() | indexer_overrides))
+
+        store = self.cache_store or get_index_cache()
+        cache_path = self._get_cache_path(path, store, indexer_overrides)
+
+        # index files are rebuilt if the source file, the indexer settings or the plugin version changed
+        meta = self._get_index_meta(path, indexer_overrides)
+        if not is_index_valid(cache_path, meta):
+            try:
+                cache_path.unlink(True)
+            except OSError:  # read-only folder (e.g. mounted BD), the existing index file is used as is
+                pass
+
+        cache = {self._cache.arg_name: str(cache_path)}
+        indexed = self._index_func(path, **(self._get_kwargs(cache) | indexer_overrides))
+
+        if cache_path.exists():
+            write_index_meta(cache_path, meta)
+
+        if store is not None:
+            store.evict(keep=cache_path)
+
+        return indexed
+
+
+    def _get_cache_path(
+        self, path: Path, store: IndexCacheStore | None, indexer_overrides: dict[str, Any]
+    ) -> Path:
+        assert self._cache
+
+        if store is None:
+            return path.with_suffix(self._cache.ext)
+
+        settings = self._get_index_settings(indexer_overrides)
+
+        return store.get_path(path, self.__class__.__name__, settings, self._cache.ext)
+
+
+    def _get_index_settings(self, indexer_overrides: dict[str, Any]) -> dict[str, Any]:
+        assert self._cache
+
+        settings = self._get_kwargs() | indexer_overrides
+        settings.pop(self._cache.arg_name, None)
+
+        if self._cache.settings is not None:
+            settings = {k: v for k, v in settings.items() if k in self._cache.settings}
+
+        return settings
+
+
+    def _get_index_meta(self, path: Path, indexer_overrides: dict[str, Any]) -> dict[str, Any]:
+        assert self._cache
+
+        plugin = getattr(core, self._cache.namespace, None) if self._cache.namespace else None
+
+        return {
+            "source": file_fingerprint(path),
+            "indexer": self.__class__.__name__,
+            "settings": {k: repr(v) for k, v in self._get_index_settings(indexer_overrides).items()},
+            "version": repr(getattr(plugin, "version", None)),
+        }
+
+
+    def index_batch(
+        self, source_files: Sequence[PathLike], workers: int | None = 1,
+        pool: Literal["thread", "process"] = "thread", **indexer_overrides: Any
+    ) -> list[IndexedT]:
+        """
+        Index multiple files using a pool of workers, one file per worker.
+
+        With a thread pool, every file is indexed in its own thread.
+        With a process pool, the index files are written by the workers, then every file is indexed in the current
+        process from the freshly written cache (VapourSynth nodes can't be sent between processes).
+
+        :param source_files:        Paths to the files
+        :param workers:             Number of workers. If None, uses the number of CPUs. Defaults to 1 (sequential)
+        :param pool:                Type of worker pool, "thread" or "process". Defaults to "thread"
+        :param indexer_overrides:   Override for indexer settings
+
+        :raises ValueError:         If the number of workers is lower than 1
+        :raises ValueError:         If a process pool is requested with an indexer that does not write a cache file
+
+        :return:                    Indexed files, in the same order as the input files
+        """
+        func_name = f"{self.__class__.__name__}.index_batch"
+        paths = [ensure_path(p, func_name) for p in source_files]
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers < 1:
+            raise ValueError(f"{func_name}: workers must be greater than 0, got {workers}.")
+
+        workers = min(workers, len(paths))
+
+        if workers <= 1:
+            return [self.index(p, **indexer_overrides) for p in paths]
+
+        if pool == "process":
+            if self._cache is None:
+                raise ValueError(f"{func_name}: process pool can only be used with indexers that write a cache file.")
+
+            # the default store is a global of this process, the spawned workers would write next to the sources
+            init_kwargs = {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+            init_kwargs["cache_store"] = self.cache_store or get_index_cache()
+
+            # spawn to avoid forking a process that already holds a VapourSynth core
+            with ProcessPoolExecutor(workers, multiprocessing.get_context("spawn")) as executor:
+                list(executor.map(
+                    _write_index, repeat(self.__class__), repeat(init_kwargs), paths, repeat(indexer_overrides)
+                ))
+
+            return [self.index(p, **indexer_overrides) for p in paths]
+
+        with ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(partial(self.index, **indexer_overrides), paths))
 
 
     @copy_signature(index)
@@ -61,3 +192,9 @@ class Indexer(ABC, Generic[IndexedT]):
 
     def copy(self: T, **kwargs: Any) -> T:
         return replace(self, **kwargs)  # type: ignore
+
+
+def _write_index(
+    indexer_type: type[Indexer[Any]], init_kwargs: dict[str, Any], path: Path, indexer_overrides: dict[str, Any]
+) -> None:
+    indexer_type(**init_kwargs).index(path, **indexer_overrides)
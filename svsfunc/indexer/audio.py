@@ -32,7 +32,7 @@ class BestSourceAudio(AudioIndexer):
     # cachesize: int | None = None  # not available in latest beta
 
     _use_bs: bool = field(init=False, repr=False)
-    _cache = IndexerCache("cachepath", ".json")
+    _cache = IndexerCache("cachepath", ".json", "bs")
 
     def __post_init__(self) -> None:
         self._use_bs = hasattr(core, "bs")
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any
+
+from ..custom_types import PathLike
+
+__all__ = ["IndexCacheStore", "file_fingerprint", "set_index_cache", "get_index_cache"]
+
+INDEX_META_SUFFIX = ".meta.json"
+
+
+def file_fingerprint(path: PathLike, samples: int = 16, block_size: int = 64 * 1024) -> str:
+    """
+    Compute a fast fingerprint of a file from its size, its modification time and a hash of evenly spaced blocks.
+    Only `samples * block_size` bytes are read, whatever the size of the file.
+
+    :param path:        Path to the file
+    :param samples:     Number of blocks to hash, defaults to 16
+    :param block_size:  Size of each block in bytes, defaults to 64 KiB
+
+    :return:            Hexadecimal fingerprint
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+
+    return _file_fingerprint(path, stat.st_size, stat.st_mtime_ns, samples, block_size)
+
+
+@lru_cache(maxsize=4096)
+def _file_fingerprint(path: Path, size: int, mtime_ns: int, samples: int, block_size: int) -> str:
+    digest = blake2b(f"{size}:{mtime_ns}".encode(), digest_size=16)
+
+    with path.open("rb") as file:
+        if size <= samples * block_size:
+            digest.update(file.read())
+        else:
+            step = (size - block_size) // max(samples - 1, 1)
+            for i in range(samples):
+                file.seek(i * step)
+                digest.update(file.read(block_size))
+
+    return digest.hexdigest()
+
+
+@dataclass
+class IndexCacheStore:
+    """
+    Folder that stores index files of every indexer, shared between projects.
+    Index files are named after the fingerprint of the source file and the indexer settings, so the same file is only
+    indexed once, wherever it is located. Least recently used index files are removed when the folder exceeds its
+    maximum size.
+    """
+
+    folder: Path
+    """Folder where the index files are stored"""
+
+    max_size: int | None = None
+    """Maximum size of the folder in bytes. If None, index files are never removed."""
+
+    def __post_init__(self) -> None:
+        self.folder = Path(self.folder).resolve()
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def key(self, source_file: Path, indexer_name: str, settings: dict[str, Any]) -> str:
+        """
+        Compute the key of an index file.
+
+        :param source_file:     Path to the indexed file
+        :param indexer_name:    Name of the indexer
+        :param settings:        Indexer settings that affect the index file
+
+        :return:                Hexadecimal key
+        """
+        digest = blake2b(file_fingerprint(source_file).encode(), digest_size=20)
+        digest.update(indexer_name.encode())
+        digest.update(repr(sorted((k, repr(v)) for k, v in settings.items())).encode())
+
+        return digest.hexdigest()
+
+    def get_path(self, source_file: Path, indexer_name: str, settings: dict[str, Any], ext: str) -> Path:
+        """
+        Get the path of the index file of a source file and mark it as recently used.
+
+        :param source_file:     Path to the indexed file
+        :param indexer_name:    Name of the indexer
+        :param settings:        Indexer settings that affect the index file
+        :param ext:             Extension of the index file
+
+        :return:                Path to the index file (may not exist yet)
+        """
+        cache_path = self.folder / f"{self.key(source_file, indexer_name, settings)}{ext}"
+
+        try:
+            os.utime(cache_path)
+        except FileNotFoundError:
+            pass
+
+        return cache_path
+
+    def size(self) -> int:
+        """
+        Total size of the index files in bytes.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep: Path | None = None) -> list[Path]:
+        """
+        Remove least recently used index files until the folder size is lower than `max_size`.
+
+        :param keep:    Index file that must not be removed (e.g. the one that was just written)
+
+        :return:        Removed index files
+        """
+        if self.max_size is None:
+            return []
+
+        entries = sorted(self._entries(), key=lambda x: x[2])
+        total = sum(size for _, size, _ in entries)
+        removed = list[Path]()
+
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+
+            path.unlink(True)
+            _get_meta_path(path).unlink(True)
+            removed.append(path)
+            total -= size
+
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove every index file.
+        """
+        for path, _, _ in self._entries():
+            path.unlink(True)
+            _get_meta_path(path).unlink(True)
+
+    def _entries(self) -> list[tuple[Path, int, int]]:
+        entries = list[tuple[Path, int, int]]()
+
+        for path in self.folder.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # removed by another process
+                continue
+
+            if path.is_file() and not path.name.endswith(INDEX_META_SUFFIX):
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+
+        return entries
+
+
+def _get_meta_path(cache_path: Path) -> Path:
+    return cache_path.with_name(cache_path.name + INDEX_META_SUFFIX)
+
+
+def is_index_valid(cache_path: Path, meta: dict[str, Any]) -> bool:
+    """
+    Check if an index file was written from the same source file, with the same indexer, settings and plugin version.
+    Index files without metadata are considered stale.
+
+    :param cache_path:  Path to the index file
+    :param meta:        Expected metadata of the index file
+
+    :return:            True if the index file exists and is up to date
+    """
+    if not cache_path.exists():
+        return False
+
+    try:
+        return bool(json.loads(_get_meta_path(cache_path).read_text()) == meta)
+    except (OSError, ValueError):
+        return False
+
+
+def write_index_meta(cache_path: Path, meta: dict[str, Any]) -> None:
+    """
+    Write the metadata of an index file next to it.
+
+    :param cache_path:  Path to the index file
+    :param meta:        Metadata of the index file
+    """
+    meta_path = _get_meta_path(cache_path)
+    content = json.dumps(meta, sort_keys=True)
+
+    try:
+        if meta_path.exists() and meta_path.read_text() == content:
+            return
+
+        tmp_path = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(content)
+        tmp_path.replace(meta_path)
+    except OSError:  # read-only folder, the index file will be validated next time
+        pass
+
+
+_default_store: IndexCacheStore | None = None
+
+
+def set_index_cache(folder: PathLike | None, max_size: int | None = None) -> IndexCacheStore | None:
+    """
+    Set the index cache folder used by every indexer that does not have its own `cache_store`.
+    If None, index files are written next to the source files.
+
+    :param folder:      Folder where the index files are stored
+    :param max_size:    Maximum size of the folder in bytes, defaults to None (unlimited)
+
+    :return:            The new default IndexCacheStore
+    """
+    global _default_store
+    _default_store = IndexCacheStore(Path(folder), max_size) if folder is not None else None
+
+    return _default_store
+
+
+def get_index_cache() -> IndexCacheStore | None:
+    """
+    Get the index cache folder used by default.
+
+    :return:    Default IndexCacheStore or None if index files are written next to the source files
+    """
+    return _default_store
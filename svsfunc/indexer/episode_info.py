@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
+from threading import Lock
 from typing import Any, Generic
 
 from vsmuxtools import src_file
@@ -15,9 +16,10 @@ __all__ = ["EpisodeInfo"]
 
 
 class EpisodeInfo(Generic[HoldsVideoNodeT]):
-    """Class that represent an indexed episode with episode number and optional OP/ED ranges."""
-    indexed: HoldsVideoNodeT
-
+    """
+    Class that represent an indexed episode with episode number and optional OP/ED ranges.
+    The file is only indexed the first time the indexed object is accessed (`indexed`, `clip` or `src_file`).
+    """
     path: Path
     ep_num: int
     op_range: tuple[int, int] | None = None
@@ -25,6 +27,11 @@ class EpisodeInfo(Generic[HoldsVideoNodeT]):
     ncop: vs.VideoNode | None
     nced: vs.VideoNode | None
 
+    _indexer: Indexer[HoldsVideoNodeT]
+    _indexer_overrides: dict[str, Any]
+    _indexed: HoldsVideoNodeT | None
+    _index_lock: Lock
+
 
     def __init__(
         self: "EpisodeInfo[HoldsVideoNodeT]", path: PathLike, ep_num: int = -1,
@@ -33,7 +40,11 @@ class EpisodeInfo(Generic[HoldsVideoNodeT]):
         indexer: Indexer[HoldsVideoNodeT] = LSMAS(), **indexer_overrides: Any
     ) -> None:
         self.path = ensure_path(path, "EpisodeInfo")
-        self.indexed = indexer.index(self.path, **indexer_overrides)
+
+        self._indexer = indexer
+        self._indexer_overrides = indexer_overrides
+        self._indexed = None
+        self._index_lock = Lock()
 
         self.ep_num = ep_num
         self.op_range = op_range
@@ -112,6 +123,35 @@ class EpisodeInfo(Generic[HoldsVideoNodeT]):
         return str(self.ep_num).zfill(padding)
 
 
+    @property
+    def indexed(self) -> HoldsVideoNodeT:
+        """
+        Indexed file. The file is indexed on first access, only once even if accessed from several threads.
+
+        :return:    Object returned by the indexer
+        """
+        if self._indexed is None:
+            with self._index_lock:
+                if self._indexed is None:
+                    self._indexed = self._indexer.index(self.path, **self._indexer_overrides)
+
+        return self._indexed
+
+
+    @indexed.setter
+    def indexed(self, indexed: HoldsVideoNodeT) -> None:
+        with self._index_lock:
+            self._indexed = indexed
+
+
+    @property
+    def is_indexed(self) -> bool:
+        """
+        Whether the file has already been indexed.
+        """
+        return self._indexed is not None
+
+
     @property
     def clip(self) -> vs.VideoNode:
         """
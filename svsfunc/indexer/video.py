@@ -25,7 +25,7 @@ class LSMAS(VideoIndexer):
     See https://github.com/AkarinVS/L-SMASH-Works for documentation.
     """
     _index_func = core.lazy.lsmas.LWLibavSource
-    _cache = IndexerCache("cachefile", ".lwi")
+    _cache = IndexerCache("cachefile", ".lwi", "lsmas", ("stream_index",))  # the other settings are decoding settings
 
     stream_index: int | None = None
     cache: bool | None = None
@@ -52,7 +52,7 @@ class DGIndexNV(VideoIndexer):
     dgdecodenv.DGSource from DGIndexNV/DGDecodeNV plugin.
     See the DGDecodeNVManual.html and DGIndexNVManual.html files for documentation.
     """
-    _cache = IndexerCache("cachefile", ".dgi")
+    _cache = IndexerCache("cachefile", ".dgi", "dgdecodenv", ())  # DGSource settings don't affect the index file
 
     i420: bool | None = None
     deinterlace: Literal[0, 1, 2] | None = None
@@ -85,7 +85,7 @@ class FFMS2(VideoIndexer):
     See https://github.com/FFMS/ffms2 for documentation.
     """
     _index_func = core.lazy.ffms2.Source
-    _cache = IndexerCache("cachefile", ".ffindex")
+    _cache = IndexerCache("cachefile", ".ffindex", "ffms2", ("track",))  # the other settings are decoding settings
 
     track: int | None = None
     cache: bool | None = None
@@ -108,7 +108,7 @@ class BestSourceVideo(VideoIndexer):
     See https://github.com/vapoursynth/bestsource for documentation.
     """
     _index_func = core.lazy.bs.VideoSource  # type: ignore
-    _cache = IndexerCache("cachepath", ".json")
+    _cache = IndexerCache("cachepath", ".json", "bs")
 
     track: int | None = None
     variableformat: bool | None = None
@@ -1,19 +1,29 @@
 from __future__ import annotations
 
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ThreadPoolExecutor, wait
+from fractions import Fraction
+from functools import partial
 from glob import glob
+from itertools import islice
 from pathlib import Path
-from typing import Any, Generic, Iterator, Sequence
+from threading import RLock
+from typing import Any, Callable, Generic, Iterable, Iterator, Sequence, TypeVar
 
 from vsmuxtools import Chapters
 from vstools import to_arr, vs
 
 from .bdmv import BDMV, MplsItem
 from .custom_types import HoldsVideoNodeT, NCRange, PathLike
+from .fingerprint import find_clip, frame_fingerprints, get_fingerprints
 from .indexer import LSMAS, EpisodeInfo, Indexer
 from .utils import normalize_list
 
 __all__ = ["ParseFolder", "ParseBD"]
 
+T = TypeVar("T")
+
 
 class HasNCs:
     _ncops: dict[int, vs.VideoNode | None]
@@ -73,6 +83,24 @@ class HasNCs:
         return [nc for nc in self._nceds.values() if nc is not None]
 
 
+# number of frames of an episode kept alive by the decoder and the frame caches, used to estimate its memory usage
+_CACHED_FRAMES_ESTIMATE = 32
+
+
+def _estimate_episode_size(episode: EpisodeInfo[Any]) -> int:
+    if not episode.is_indexed:
+        return 0
+
+    clip = episode.clip
+    if clip.format is None or not clip.width or not clip.height:
+        return 0
+
+    fmt = clip.format
+    luma = clip.width * clip.height * fmt.bytes_per_sample
+    chroma = (fmt.num_planes - 1) * (luma >> (fmt.subsampling_w + fmt.subsampling_h))
+
+    return (luma + chroma) * _CACHED_FRAMES_ESTIMATE
+
 
 class HasEpisode(HasNCs, Generic[HoldsVideoNodeT]):
     episodes: list[Path]
@@ -80,8 +108,16 @@ class HasEpisode(HasNCs, Generic[HoldsVideoNodeT]):
     op_ranges: list[tuple[int, int] | None]
     ed_ranges: list[tuple[int, int] | None]
 
-    _ep_cache: dict[int, EpisodeInfo[HoldsVideoNodeT]]
-    _idx: int
+    _ep_cache: OrderedDict[int, EpisodeInfo[HoldsVideoNodeT]]
+    _cache_max_episodes: int | None
+    _cache_max_bytes: int | None
+    _ep_lock: RLock
+    _prefetch: int
+    _prefetch_workers: int
+    _prefetch_progress: Callable[[int, int, int], None] | None
+    _prefetch_executor: ThreadPoolExecutor | None
+    _prefetch_pending: dict[int, Future[EpisodeInfo[HoldsVideoNodeT]]]
+    _prefetch_done: int
 
     def __init__(self, eps: Sequence[Path]) -> None:
         super().__init__()
@@ -95,7 +131,16 @@ class HasEpisode(HasNCs, Generic[HoldsVideoNodeT]):
                 raise ValueError(f"{self.__class__.__name__}: file with path \"{ep}\" does not exist.")
             self.episodes.append(ep)
 
-        self._ep_cache = {}
+        self._ep_cache = OrderedDict()
+        self._cache_max_episodes = None
+        self._cache_max_bytes = None
+        self._ep_lock = RLock()
+
+        self._prefetch_executor = None
+        self._prefetch_pending = {}
+        self._prefetch_done = 0
+        self.set_prefetch(0)
+
         self.set_op_ed_ranges()
 
     @property
@@ -106,7 +151,8 @@ class HasEpisode(HasNCs, Generic[HoldsVideoNodeT]):
         self, ep_num: int, force_reindex: bool = False, **indexer_overrides: Any
     ) -> EpisodeInfo[HoldsVideoNodeT]:
         """
-        Get indexed episode
+        Get episode. The file is indexed the first time its clip is accessed. If the episode is being indexed in the
+        background (see :py:meth:`warm_cache`), waits for the indexing to finish.
 
         :param ep_num:              Episode to get (one-based)
         :param force_reindex:       Re-index episode even if it is present in cache
@@ -114,16 +160,246 @@ class HasEpisode(HasNCs, Generic[HoldsVideoNodeT]):
 
         :return:                    EpisodeInfo object
         """
-        if (force_reindex or indexer_overrides) and ep_num in self._ep_cache:
+        force_reindex = force_reindex or bool(indexer_overrides)
+
+        with self._ep_lock:
+            if force_reindex:
+                self._ep_cache.pop(ep_num, None)
+
+                # the prefetched episode is indexed with the default settings, it must not replace this one
+                if (pending := self._prefetch_pending.pop(ep_num, None)) is not None:
+                    pending.cancel()
+            else:
+                pending = self._prefetch_pending.get(ep_num)
+
+                if ep_num in self._ep_cache:
+                    self._ep_cache.move_to_end(ep_num)
+                    return self._ep_cache[ep_num]
+
+        episode: EpisodeInfo[HoldsVideoNodeT] | None = None
+
+        if not force_reindex and pending is not None:
+            try:
+                episode = pending.result()
+            except CancelledError:
+                # the prefetch was cancelled by release() before it started, the episode is indexed here instead
+                pass
+
+        if episode is None:
+            episode = self._create_episode(ep_num, **indexer_overrides)
+
+        with self._ep_lock:
+            return self._cache_episode(ep_num, episode, replace=force_reindex)
+
+
+    def _cache_episode(
+        self, ep_num: int, episode: EpisodeInfo[HoldsVideoNodeT], replace: bool = False
+    ) -> EpisodeInfo[HoldsVideoNodeT]:
+        if replace:
+            self._ep_cache[ep_num] = episode
+        else:
+            episode = self._ep_cache.setdefault(ep_num, episode)
+        self._ep_cache.move_to_end(ep_num)
+        self._enforce_cache_limit(keep=ep_num)
+
+        return episode
+
+
+    def set_cache_limit(self, max_episodes: int | None = None, max_bytes: int | None = None) -> None:
+        """
+        Limit the number of episodes kept in cache. When a limit is exceeded, the least recently used episodes are
+        evicted (see :py:meth:`evict`). With a limit, iterating over the episodes only keeps a few episodes alive.
+        Episodes that are prefetched (see :py:meth:`set_prefetch`) are always kept.
+
+        :param max_episodes:    Maximum number of episodes in cache. None for no limit.
+        :param max_bytes:       Maximum estimated memory used by the episodes in cache (see :py:attr:`cache_size`).
+                                Episodes are only counted once indexed. None for no limit.
+
+        :raises ValueError:     If a limit is lower than 1
+        """
+        func_name = f"{self.__class__.__name__}.set_cache_limit"
+
+        if max_episodes is not None and max_episodes < 1:
+            raise ValueError(f"{func_name}: max_episodes must be greater than 0, got {max_episodes}.")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError(f"{func_name}: max_bytes must be greater than 0, got {max_bytes}.")
+
+        with self._ep_lock:
+            self._cache_max_episodes = max_episodes
+            self._cache_max_bytes = max_bytes
+            self._enforce_cache_limit()
+
+
+    @property
+    def cache_size(self) -> int:
+        """
+        Estimated memory used by the episodes in cache, in bytes. Only indexed episodes are counted, as the size of
+        the frames kept by the decoder and the frame caches of their clip.
+        """
+        with self._ep_lock:
+            return sum(_estimate_episode_size(episode) for episode in self._ep_cache.values())
+
+
+    def _enforce_cache_limit(self, keep: int | None = None) -> None:
+        max_episodes = self._cache_max_episodes
+        if max_episodes is not None:
+            max_episodes = max(max_episodes, self._prefetch + 1)
+
+        if self._cache_max_bytes is not None:
+            sizes = {ep_num: _estimate_episode_size(episode) for ep_num, episode in self._ep_cache.items()}
+        else:
+            sizes = dict.fromkeys(self._ep_cache, 0)
+        total = sum(sizes.values())
+
+        for ep_num in list(self._ep_cache):
+            over_count = max_episodes is not None and len(self._ep_cache) > max_episodes
+            over_size = self._cache_max_bytes is not None and total > self._cache_max_bytes
+
+            if not over_count and not over_size:
+                break
+            if ep_num == keep:
+                continue
+
             del self._ep_cache[ep_num]
+            total -= sizes[ep_num]
 
-        if ep_num not in self._ep_cache:
-            self._ep_cache[ep_num] = EpisodeInfo(
-                self.episodes[ep_num - 1], ep_num, self.op_ranges[ep_num - 1], self.ed_ranges[ep_num - 1],
-                self._ncops.get(ep_num), self._nceds.get(ep_num), self.indexer, **indexer_overrides
-            )
 
-        return self._ep_cache[ep_num]
+    def evict(self, ep_nums: int | Iterable[int] | None = None) -> list[int]:
+        """
+        Remove episodes from the cache. They are created (and indexed) again the next time they are needed.
+
+        :param ep_nums:     Episodes to remove (one-based). If None, every episode is removed.
+
+        :return:            Removed episodes
+        """
+        with self._ep_lock:
+            if ep_nums is None:
+                ep_nums = list(self._ep_cache)
+            elif isinstance(ep_nums, int):
+                ep_nums = [ep_nums]
+
+            return [ep_num for ep_num in ep_nums if self._ep_cache.pop(ep_num, None) is not None]
+
+
+    def release(self) -> None:
+        """
+        Remove every episode from the cache, cancel the episodes queued for prefetching and stop the prefetching
+        threads. Prefetching starts again with the next iteration or call to :py:meth:`warm_cache`.
+        """
+        with self._ep_lock:
+            executor, self._prefetch_executor = self._prefetch_executor, None
+
+            # episodes that are already being indexed can't be cancelled, they are detached so that they are not
+            # added to the cache when they are done
+            for future in list(self._prefetch_pending.values()):
+                future.cancel()
+
+            self._prefetch_pending.clear()
+            self._ep_cache.clear()
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+    def _create_episode(self, ep_num: int, **indexer_overrides: Any) -> EpisodeInfo[HoldsVideoNodeT]:
+        return EpisodeInfo(
+            self.episodes[ep_num - 1], ep_num, self.op_ranges[ep_num - 1], self.ed_ranges[ep_num - 1],
+            self._ncops.get(ep_num), self._nceds.get(ep_num), self.indexer, **indexer_overrides
+        )
+
+
+    def _index_episode(self, ep_num: int) -> EpisodeInfo[HoldsVideoNodeT]:
+        episode = self._create_episode(ep_num)
+        episode.indexed  # episodes are indexed lazily, prefetched episodes must be indexed in the background
+
+        return episode
+
+
+    def set_prefetch(
+        self, prefetch: int, workers: int = 1, progress: Callable[[int, int, int], None] | None = None
+    ) -> None:
+        """
+        Set the number of episodes indexed in the background when iterating over the episodes. When episode `k` is
+        returned by the iterator, episodes `k + 1` to `k + prefetch` start being indexed so that they are ready when
+        the iteration moves on.
+
+        :param prefetch:    Number of episodes to index ahead of the current one. 0 disables prefetching.
+        :param workers:     Number of episodes indexed at the same time. Defaults to 1
+        :param progress:    Function called every time an episode has been indexed in the background, with the episode
+                            number, the number of episodes indexed in the background and the number of episodes queued.
+
+        :raises ValueError: If prefetch is negative or if workers is lower than 1
+        """
+        func_name = f"{self.__class__.__name__}.set_prefetch"
+
+        if prefetch < 0:
+            raise ValueError(f"{func_name}: prefetch must be positive, got {prefetch}.")
+        if workers < 1:
+            raise ValueError(f"{func_name}: workers must be greater than 0, got {workers}.")
+
+        if self._prefetch_executor is not None and workers != self._prefetch_workers:
+            self._prefetch_executor.shutdown(wait=False)
+            self._prefetch_executor = None
+
+        self._prefetch = prefetch
+        self._prefetch_workers = workers
+        self._prefetch_progress = progress
+
+
+    def warm_cache(self, ep_nums: Iterable[int] | None = None) -> list[Future[EpisodeInfo[HoldsVideoNodeT]]]:
+        """
+        Start indexing episodes in the background. Episodes that are already indexed or queued are skipped.
+        Uses the workers and progress callback set with :py:meth:`set_prefetch`.
+
+        :param ep_nums:     Episodes to index (one-based). If None, every episode is indexed.
+
+        :raises IndexError: If an episode number is out of range
+
+        :return:            Futures of the queued episodes
+        """
+        if ep_nums is None:
+            ep_nums = range(1, self.episode_number + 1)
+
+        futures = list[Future[EpisodeInfo[HoldsVideoNodeT]]]()
+
+        with self._ep_lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(
+                    self._prefetch_workers, f"{self.__class__.__name__}.prefetch"
+                )
+
+            for ep_num in ep_nums:
+                if not 1 <= ep_num <= self.episode_number:
+                    raise IndexError(f"{self.__class__.__name__}.warm_cache: episode {ep_num} does not exist.")
+
+                if ep_num in self._ep_cache or ep_num in self._prefetch_pending:
+                    continue
+
+                future = self._prefetch_executor.submit(self._index_episode, ep_num)
+                self._prefetch_pending[ep_num] = future
+                future.add_done_callback(partial(self._on_prefetched, ep_num))
+                futures.append(future)
+
+        return futures
+
+
+    def _on_prefetched(self, ep_num: int, future: Future[EpisodeInfo[HoldsVideoNodeT]]) -> None:
+        with self._ep_lock:
+            # detached by release() or replaced by a re-indexed episode
+            if self._prefetch_pending.get(ep_num) is not future:
+                return
+
+            del self._prefetch_pending[ep_num]
+
+            if future.cancelled() or future.exception() is not None:
+                return
+
+            self._cache_episode(ep_num, future.result())
+            self._prefetch_done += 1
+            done, queued = self._prefetch_done, self._prefetch_done + len(self._prefetch_pending)
+
+        if self._prefetch_progress is not None:
+            self._prefetch_progress(ep_num, done, queued)
 
 
     def set_op_ed_ranges(
@@ -144,19 +420,153 @@ class HasEpisode(HasNCs, Generic[HoldsVideoNodeT]):
         self.ed_ranges = normalize_list(ed_ranges, self.episode_number, None, func_name)
 
 
+    def detect_op_ed_ranges(
+        self, workers: int = 1, threshold: int = 10
+    ) -> tuple[list[tuple[int, int] | None], list[tuple[int, int] | None]]:
+        """
+        Find the OP/ED range of every episode that has a NCOP/NCED (see :py:meth:`set_ncs`) and set them as with
+        :py:meth:`set_op_ed_ranges`. Episodes and NCs are compared with the fingerprints of their frames
+        (see :py:func:`svsfunc.fingerprint.find_clip`), fingerprints of the episodes are saved for the next detections.
+        Ranges of episodes without NC are kept.
+
+        :param workers:     Number of episodes processed at the same time. Defaults to 1
+        :param threshold:   Maximum number of different bits between the fingerprints of two matching frames,
+                            defaults to 10
+
+        :raises ValueError: If workers is lower than 1
+
+        :return:            Detected OP and ED ranges, None if the NC was not found in the episode
+        """
+        if workers < 1:
+            raise ValueError(f"{self.__class__.__name__}.detect_op_ed_ranges: workers must be greater than 0.")
+
+        # every NC is fingerprinted once, even if it is shared by several episodes
+        nc_fingerprints: dict[int, Future[array[int]]] = {}
+
+        def _detect(ep_num: int) -> tuple[tuple[int, int] | None, tuple[int, int] | None]:
+            # episodes without NC are not indexed nor fingerprinted, their ranges are kept (None if not set)
+            if self._ncops.get(ep_num) is None and self._nceds.get(ep_num) is None:
+                return self.op_ranges[ep_num - 1], self.ed_ranges[ep_num - 1]
+
+            ep_fingerprints = get_fingerprints(self.get_episode(ep_num))
+            ranges = list[tuple[int, int] | None]()
+
+            for ncs, current in [(self._ncops, self.op_ranges), (self._nceds, self.ed_ranges)]:
+                if (nc := ncs.get(ep_num)) is None:
+                    ranges.append(current[ep_num - 1])
+                    continue
+
+                ranges.append(find_clip(ep_fingerprints, nc_fingerprints[id(nc)].result(), threshold))
+
+            return ranges[0], ranges[1]
+
+        with ThreadPoolExecutor(workers, f"{self.__class__.__name__}.detect_op_ed_ranges") as executor:
+            for nc in [*self.ncops, *self.nceds]:
+                if id(nc) not in nc_fingerprints:
+                    nc_fingerprints[id(nc)] = executor.submit(frame_fingerprints, nc)
+
+            results = list(executor.map(_detect, range(1, self.episode_number + 1)))
+
+        self.set_op_ed_ranges([op for op, _ in results], [ed for _, ed in results])
+
+        with self._ep_lock:
+            for ep_num, episode in self._ep_cache.items():
+                episode.op_range, episode.ed_range = results[ep_num - 1]
+
+        return self.op_ranges, self.ed_ranges
+
+
+    def map_episodes(
+        self, func: Callable[[EpisodeInfo[HoldsVideoNodeT]], T], ep_nums: Iterable[int] | None = None,
+        workers: int = 1, ordered: bool = True
+    ) -> Iterator[tuple[EpisodeInfo[HoldsVideoNodeT], T]]:
+        """
+        Run a function on several episodes at the same time (e.g. filtering or encoding).
+        Episodes are taken from the shared cache, so they are only created and indexed once. Only `2 * workers`
+        episodes are queued at the same time, so this can be used with :py:meth:`set_cache_limit`.
+
+        :param func:        Function called with every episode
+        :param ep_nums:     Episodes to process (one-based). If None, every episode is processed.
+        :param workers:     Number of episodes processed at the same time. Defaults to 1
+        :param ordered:     Return the results in the order of the episodes. If False, results are returned as soon
+                            as they are ready. Defaults to True
+
+        :raises ValueError: If workers is lower than 1
+        :raises IndexError: If an episode number is out of range
+
+        :return:            Iterator of the episodes with the result of the function
+        """
+        if workers < 1:
+            raise ValueError(f"{self.__class__.__name__}.map_episodes: workers must be greater than 0, got {workers}.")
+
+        ep_nums = list(range(1, self.episode_number + 1) if ep_nums is None else ep_nums)
+
+        for ep_num in ep_nums:
+            if not 1 <= ep_num <= self.episode_number:
+                raise IndexError(f"{self.__class__.__name__}.map_episodes: episode {ep_num} does not exist.")
+
+        return self._map_episodes(func, ep_nums, workers, ordered)
+
+
+    def _map_episodes(
+        self, func: Callable[[EpisodeInfo[HoldsVideoNodeT]], T], ep_nums: list[int], workers: int, ordered: bool
+    ) -> Iterator[tuple[EpisodeInfo[HoldsVideoNodeT], T]]:
+        def _run(ep_num: int) -> tuple[EpisodeInfo[HoldsVideoNodeT], T]:
+            episode = self.get_episode(ep_num)
+            return episode, func(episode)
+
+        queue = iter(ep_nums)
+        pending = deque[Future[tuple[EpisodeInfo[HoldsVideoNodeT], T]]]()
+
+        executor = ThreadPoolExecutor(workers, f"{self.__class__.__name__}.map_episodes")
+
+        try:
+            for ep_num in islice(queue, 2 * workers):
+                pending.append(executor.submit(_run, ep_num))
+
+            while pending:
+                if ordered:
+                    future = pending.popleft()
+                else:
+                    future = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+                    pending.remove(future)
+
+                result = future.result()
+
+                for ep_num in islice(queue, 1):
+                    pending.append(executor.submit(_run, ep_num))
+
+                yield result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
     def __iter__(self) -> Iterator[EpisodeInfo[HoldsVideoNodeT]]:
-        self._idx = 1
+        return _EpisodeIterator(self)
+
+
+
+class _EpisodeIterator(Generic[HoldsVideoNodeT]):
+    """Iterator over the episodes of a parser, every loop has its own position"""
+
+    def __init__(self, parser: HasEpisode[HoldsVideoNodeT]) -> None:
+        self._parser = parser
+        self._ep_num = 1
+
+    def __iter__(self) -> _EpisodeIterator[HoldsVideoNodeT]:
         return self
 
     def __next__(self) -> EpisodeInfo[HoldsVideoNodeT]:
-        try:
-            episode = self.get_episode(self._idx)
-        except IndexError:
-            self._idx = 1
+        parser, ep_num = self._parser, self._ep_num
+
+        if ep_num > parser.episode_number:
             raise StopIteration
 
-        self._idx += 1
-        return episode
+        if parser._prefetch:
+            parser.warm_cache(range(ep_num + 1, min(ep_num + parser._prefetch, parser.episode_number) + 1))
+
+        self._ep_num += 1
+        return parser.get_episode(ep_num)
 
 
 
@@ -202,8 +612,8 @@ class ParseBD(HasEpisode[HoldsVideoNodeT], HasNCs):
 
     def __init__(
         self: "ParseBD[HoldsVideoNodeT]",
-        bdmv_path: PathLike | list[PathLike] | tuple[PathLike, list[PathLike]],
-        ep_playlist: int | Sequence[int], indexer: Indexer[HoldsVideoNodeT] = LSMAS()
+        bdmv_path: PathLike | list[PathLike] | tuple[PathLike, list[PathLike]] | BDMV,
+        ep_playlist: int | Sequence[int] | None = None, indexer: Indexer[HoldsVideoNodeT] = LSMAS()
     ) -> None:
         """
         Parse BDMV and list every file in matching episode playlist(s).
@@ -211,17 +621,23 @@ class ParseBD(HasEpisode[HoldsVideoNodeT], HasNCs):
         :param bdmv_path:       Path to the BDMV. If str or Path, it must be the folder that contains every BD volume.
                                 If list of str/Path, it is the list to the folder of every volume.
                                 If tuple, first value is path to BDMV folder, second is list of every volume.
-        :param ep_playlist:     ID of the playlist file for the episodes, can be set for each BD volume
+                                Can also be an already parsed BDMV (e.g. from :py:meth:`svsfunc.bdmv.BDMV.scan`).
+        :param ep_playlist:     ID of the playlist file for the episodes, can be set for each BD volume.
+                                If None, the playlists are detected with
+                                :py:meth:`svsfunc.bdmv.BDMV.detect_episode_playlists`.
         :param indexer:         Indexer used to index the files. Defaults to :py:meth:`svsfunc.indexer.Indexer.lsmas`
 
         :raises ValueError:     If the BDMV folder does not exists
         :raises ValueError:     If any of the BD volume folder does not exists
         :raises ValueError:     If BD volume cannot be found (in recursive search)
         :raises ValueError:     If number of episode playlist is greater than number of BD volume
+        :raises ValueError:     If no episode playlist can be detected in a BD volume
         """
         self.indexer = indexer
 
-        if isinstance(bdmv_path, tuple):
+        if isinstance(bdmv_path, BDMV):
+            bdmv = bdmv_path
+        elif isinstance(bdmv_path, tuple):
             folder, volumes = bdmv_path
             bdmv = BDMV.from_volumes(volumes, folder)
         elif isinstance(bdmv_path, list):
@@ -231,6 +647,9 @@ class ParseBD(HasEpisode[HoldsVideoNodeT], HasNCs):
 
         self.bdmv = bdmv
 
+        if ep_playlist is None:
+            ep_playlist = self.bdmv.detect_episode_playlists()
+
         ep_playlist = to_arr(ep_playlist)
         ep_playlist = normalize_list(ep_playlist, len(self.bdmv.bd_volumes), ep_playlist[-1], "ParseBD")
 
@@ -241,6 +660,60 @@ class ParseBD(HasEpisode[HoldsVideoNodeT], HasNCs):
         super().__init__([item.m2ts_file for item in self.items])
 
 
+    def get_frame_count(self, ep_num: int) -> int:
+        """
+        Get the number of frames of an episode without indexing it, using the clip information of the BD.
+
+        :param ep_num:      Number of the episode, one-based
+
+        :raises ValueError: If the CLPI file of the episode cannot be found or read
+
+        :return:            Number of frames of the episode
+        """
+        return self.items[ep_num - 1].clip_frame_count
+
+
+    def get_duration(self, ep_num: int) -> Fraction:
+        """
+        Get the duration of an episode without indexing it, using the clip information of the BD.
+
+        :param ep_num:      Number of the episode, one-based
+
+        :raises ValueError: If the CLPI file of the episode cannot be found or read
+
+        :return:            Duration of the episode in seconds
+        """
+        return self.items[ep_num - 1].clip_info.duration
+
+
+    def check_ranges(self) -> None:
+        """
+        Check that every OP/ED range is inside its episode and that every chapter is before the end of its episode,
+        using the clip information of the BD instead of indexing the episodes.
+
+        :raises ValueError: If a range or a chapter is outside of its episode
+        """
+        for ep_num, item in enumerate(self.items, 1):
+            frame_count = item.clip_frame_count
+
+            for name, frame_range in (("OP", self.op_ranges[ep_num - 1]), ("ED", self.ed_ranges[ep_num - 1])):
+                if frame_range is None:
+                    continue
+
+                start, end = frame_range
+                if not 0 <= start <= end < frame_count:
+                    raise ValueError(
+                        f"ParseBD.check_ranges: {name} range {frame_range} of episode {ep_num} is outside of the " +
+                        f"episode (0-{frame_count - 1})."
+                    )
+
+            if (invalid := [chap for chap in item.chapters if not 0 <= chap < frame_count]):
+                raise ValueError(
+                    f"ParseBD.check_ranges: chapters {invalid} of episode {ep_num} are outside of the episode " +
+                    f"(0-{frame_count - 1})."
+                )
+
+
     def get_chapter(self, ep_num: int, chapters_names: list[str | None] | None = None) -> Chapters:
         """Get a list of chapters of an episode
 
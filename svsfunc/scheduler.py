@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Literal
+
+from vstools import core, vs
+
+from .custom_types import PathLike
+from .filterchain import BaseFilterchain
+from .indexer import EpisodeInfo
+from .parse import HasEpisode
+
+__all__ = ["JobState", "EpisodeScheduler"]
+
+JobStatus = Literal["pending", "running", "done", "failed"]
+
+
+@dataclass
+class JobState:
+    """State of the job of an episode, saved in the job-state file"""
+
+    ep_num: int
+    """Episode number (one-based)"""
+
+    status: JobStatus = "pending"
+    """Status of the job"""
+
+    attempts: int = 0
+    """Number of times the job was started"""
+
+    frames: int = 0
+    """Number of frames of the filtered clip"""
+
+    elapsed: float = 0.0
+    """Duration of the last attempt in seconds"""
+
+    output: str | None = None
+    """Value returned by the encode step (e.g. path to the encoded file)"""
+
+    error: str | None = None
+    """Error of the last failed attempt"""
+
+    @property
+    def fps(self) -> float:
+        """Frames processed per second by the last attempt"""
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+
+# parsers created by the worker processes, reused by every job of the process
+_worker_parsers = dict[Callable[[], HasEpisode[Any]], HasEpisode[Any]]()
+
+
+def _run_job(
+    parser_factory: Callable[[], HasEpisode[Any]],
+    filterchain: Callable[[EpisodeInfo[Any]], BaseFilterchain],
+    encode: Callable[[EpisodeInfo[Any], vs.VideoNode], Any],
+    ep_num: int, threads: int, max_cache_size: int | None
+) -> tuple[int, float, str | None]:
+    core.num_threads = threads
+    if max_cache_size is not None:
+        core.max_cache_size = max_cache_size
+
+    if parser_factory not in _worker_parsers:
+        _worker_parsers[parser_factory] = parser_factory()
+
+    start = time.perf_counter()
+
+    episode = _worker_parsers[parser_factory].get_episode(ep_num)
+    clip = filterchain(episode).filter()
+    output = encode(episode, clip)
+
+    return clip.num_frames, time.perf_counter() - start, None if output is None else str(output)
+
+
+class EpisodeScheduler:
+    """
+    Run the filterchain and the encode step of several episodes in parallel, one process per episode.
+    The state of every job is saved in a JSON file, so that an interrupted run only processes the remaining episodes.
+
+    VapourSynth objects cannot be sent to other processes, so every worker process creates its own parser with
+    `parser_factory`. `parser_factory`, `filterchain` and `encode` must be picklable (e.g. defined at module level).
+    """
+
+    parser_factory: Callable[[], HasEpisode[Any]]
+    filterchain: Callable[[EpisodeInfo[Any]], BaseFilterchain]
+    encode: Callable[[EpisodeInfo[Any], vs.VideoNode], Any]
+    workers: int
+    threads_per_job: int
+    max_cache_size: int | None
+    retries: int
+    state_file: Path
+    progress: Callable[[JobState], None] | None
+
+    jobs: dict[int, JobState]
+
+    def __init__(
+        self, parser_factory: Callable[[], HasEpisode[Any]],
+        filterchain: Callable[[EpisodeInfo[Any]], BaseFilterchain],
+        encode: Callable[[EpisodeInfo[Any], vs.VideoNode], Any],
+        workers: int = 1, threads_per_job: int | None = None, max_cache_size: int | None = None,
+        retries: int = 1, state_file: PathLike = "jobs.json", progress: Callable[[JobState], None] | None = None
+    ) -> None:
+        """
+        :param parser_factory:      Function that creates the parser (ParseFolder, ParseBD...) of the episodes
+        :param filterchain:         Function or class that creates the filterchain of an episode
+        :param encode:              Function that encodes the filtered clip of an episode. Its return value is saved
+                                    in the job state (e.g. path to the encoded file).
+        :param workers:             Number of episodes processed at the same time. Defaults to 1
+        :param threads_per_job:     VapourSynth threads of every worker (`core.num_threads`).
+                                    Defaults to the number of CPUs divided by the number of workers.
+        :param max_cache_size:      VapourSynth cache size of every worker in MB (`core.max_cache_size`).
+                                    Defaults to the VapourSynth default.
+        :param retries:             Number of times a failed episode is retried. Defaults to 1
+        :param state_file:          Path to the job-state file. Defaults to "jobs.json"
+        :param progress:            Function called with the state of a job every time it changes
+
+        :raises ValueError:         If workers or threads_per_job is lower than 1, or retries is negative
+        """
+        if workers < 1:
+            raise ValueError(f"EpisodeScheduler: workers must be greater than 0, got {workers}.")
+        if threads_per_job is not None and threads_per_job < 1:
+            raise ValueError(f"EpisodeScheduler: threads_per_job must be greater than 0, got {threads_per_job}.")
+        if retries < 0:
+            raise ValueError(f"EpisodeScheduler: retries must be positive, got {retries}.")
+
+        self.parser_factory = parser_factory
+        self.filterchain = filterchain
+        self.encode = encode
+        self.workers = workers
+        self.threads_per_job = threads_per_job or max((os.cpu_count() or 1) // workers, 1)
+        self.max_cache_size = max_cache_size
+        self.retries = retries
+        self.state_file = Path(state_file)
+        self.progress = progress
+
+        self.jobs = self._load_state()
+
+
+    def _load_state(self) -> dict[int, JobState]:
+        try:
+            saved = json.loads(self.state_file.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise ValueError(f"EpisodeScheduler: cannot read job-state file \"{self.state_file}\".") from e
+
+        jobs = {int(ep_num): JobState(**state) for ep_num, state in saved.items()}
+
+        # jobs that were running when the previous run was interrupted are started again
+        for job in jobs.values():
+            if job.status == "running":
+                job.status = "pending"
+
+        return jobs
+
+
+    def _save_state(self) -> None:
+        tmp_path = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({ep_num: asdict(job) for ep_num, job in sorted(self.jobs.items())}, indent=4))
+        tmp_path.replace(self.state_file)
+
+
+    def _update(self, job: JobState, **changes: Any) -> None:
+        for name, value in changes.items():
+            setattr(job, name, value)
+
+        self._save_state()
+
+        if self.progress is not None:
+            self.progress(job)
+
+
+    def run(self, ep_nums: Iterable[int] | None = None, rerun_failed: bool = True) -> dict[int, JobState]:
+        """
+        Process the episodes that are not done yet.
+
+        :param ep_nums:         Episodes to process (one-based). If None, every episode of the parser is processed.
+        :param rerun_failed:    Process the episodes that failed in a previous run again. Defaults to True
+
+        :return:                State of every job
+        """
+        if ep_nums is None:
+            ep_nums = range(1, self.parser_factory().episode_number + 1)
+
+        queue = list[JobState]()
+
+        for ep_num in ep_nums:
+            job = self.jobs.setdefault(ep_num, JobState(ep_num))
+
+            if job.status == "done" or (job.status == "failed" and not rerun_failed):
+                continue
+
+            job.status, job.attempts, job.error = "pending", 0, None
+            queue.append(job)
+
+        self._save_state()
+
+        running = dict[Future[tuple[int, float, str | None]], JobState]()
+        executor = self._new_executor()
+
+        try:
+            while queue or running:
+                while queue and len(running) < self.workers:
+                    try:
+                        future = self._submit(executor, queue[0].ep_num)
+                    except BrokenProcessPool:
+                        # the running jobs of the broken pool are retried when their futures fail
+                        if running:
+                            break
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = self._new_executor()
+                        continue
+
+                    job = queue.pop(0)
+                    running[future] = job
+                    self._update(job, status="running", attempts=job.attempts + 1)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = False
+
+                for future in done:
+                    job = running.pop(future)
+
+                    try:
+                        frames, elapsed, output = future.result()
+                    except BrokenProcessPool as e:
+                        broken = True
+                        self._on_failure(job, e, queue)
+                    except Exception as e:
+                        self._on_failure(job, e, queue)
+                    else:
+                        self._update(job, status="done", frames=frames, elapsed=elapsed, output=output, error=None)
+
+                if broken:
+                    # a worker crashed: the jobs still running are lost and the pool must be created again
+                    for job in running.values():
+                        self._on_failure(job, BrokenProcessPool("a worker process crashed"), queue)
+                    running.clear()
+
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self._new_executor()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return self.jobs
+
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn so that the workers do not inherit the VapourSynth core of this process
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+    def _submit(self, executor: ProcessPoolExecutor, ep_num: int) -> Future[tuple[int, float, str | None]]:
+        return executor.submit(
+            _run_job, self.parser_factory, self.filterchain, self.encode, ep_num,
+            self.threads_per_job, self.max_cache_size
+        )
+
+
+    def _on_failure(self, job: JobState, error: BaseException, queue: list[JobState]) -> None:
+        retry = job.attempts <= self.retries
+        self._update(job, status="pending" if retry else "failed", error=f"{type(error).__name__}: {error}")
+
+        if retry:
+            queue.append(job)
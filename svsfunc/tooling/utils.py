@@ -1,65 +1,395 @@
 __all__ = ["UtilsTooling"]
 
 import os
+import random
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from hashlib import blake2b
+from pathlib import Path
 from shutil import rmtree
-from typing import Any
+from typing import Any, Iterator
 
 from vardautomation import logger, make_comps
-from vstools import Keyframes, SceneChangeMode
+from vstools import SceneChangeMode, core, vs
 
-from ..indexer import LSMAS
-from ..utils import write_props
+from ..indexer import LSMAS, EpisodeInfo, file_fingerprint
+from ..utils import trim, write_props
 from .base import BaseEncoder
 
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def _write_png(path: Path, frame: vs.VideoFrame) -> None:
+    # RGB24 frame to 8 bits truecolor PNG, zlib releases the GIL so PNGs can be written in parallel
+    width, height = frame.width, frame.height
+    row_size = width * 3
+
+    pixels = bytearray(row_size * height)
+    for plane in range(3):
+        pixels[plane::3] = frame[plane].tobytes()  # type: ignore[index]
+
+    view = memoryview(pixels)
+    raw = b"".join(b"\x00" + view[y * row_size:(y + 1) * row_size] for y in range(height))
+
+    path.write_bytes(b"".join([
+        _PNG_SIGNATURE,
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        _png_chunk(b"IDAT", zlib.compress(raw, 6)),
+        _png_chunk(b"IEND", b"")
+    ]))
+
 
 class UtilsTooling(BaseEncoder):
     """Set of useful functions"""
 
-    def make_comp(self, num_frames: int = 100, **comp_args: Any) -> None:
+    def make_comp(
+        self, num_frames: int = 100, frames: list[int] | None = None, path: str = "comps", force_bt709: bool = True,
+        workers: int | None = None, balanced: bool = False, **comp_args: Any
+    ) -> None:
         """
         Make comp with source, filtered and encoded file. Will use lossless intermediate if the file exists.
+        Frames are picked once and requested from every clip at the same time, then written as PNG by a pool of
+        threads to `path/<clip name>/<frame number>.png`. Lossless and encoded files are indexed with a cache,
+        so the index files are reused by the next comps.
 
         :param num_frames:      Number of comp to generate.
-        :param delete_index:    Delete index file generated when indexing `file.name_file_final` and/or lossless clip.
+        :param frames:          Frames to compare, picked randomly (or with :py:meth:`select_comp_frames`) if None.
+        :param path:            Folder where the comps are written. Defaults to "comps".
+        :param force_bt709:     Convert to RGB with the BT.709 matrix instead of the matrix of the clips.
                                 Defaults to True.
-        :param comp_args:       Additional paramters to be passed to :py:func:`make_comp`
+        :param workers:         Number of threads writing PNGs. Defaults to the number of CPUs.
+        :param balanced:        Balance picture types, scenes and brightness of the picked frames instead of picking
+                                them randomly. This decodes the whole encoded file once. Defaults to False.
+        :param comp_args:       Additional paramters to be passed to vardautomation's :py:func:`make_comps`
+                                (e.g. to upload the comps). The frames are still picked once.
         """
         logger.info("Generating comps")
 
-        args: dict[str, Any] = dict(num=num_frames, force_bt709=True)
-        args |= comp_args
+        if os.path.isdir(path):
+            rmtree(path)
+            logger.info(f"Removed old {path} folder")
 
-        if os.path.isdir("comps"):
-            rmtree("comps")
-            logger.info("Removed old comps folder")
-
-        idx = LSMAS(cache=False)
+        idx = LSMAS()
 
         lossless = self.file.name_clip_output.append_stem("_lossless.mkv")
         filtered = idx(lossless.to_str()) if lossless.exists() else self.clip
-        make_comps({
+        encode = idx(self.file.name_file_final.to_str())
+        clips = {
             "source": write_props(self.file.clip_cut, clip_name="Source"),
             "filtered": write_props(filtered, clip_name="Filtered"),
-            "encode": write_props(idx(self.file.name_file_final.to_str()), clip_name="Encode"),
-        }, **args)
+            "encode": write_props(encode, clip_name="Encode"),
+        }
+
+        if frames is None:
+            length = min(clip.num_frames for clip in clips.values())
+
+            if balanced:
+                frames = self.select_comp_frames(encode[:length], num_frames)
+            else:
+                frames = sorted(random.sample(range(length), min(num_frames, length)))
+
+        if comp_args:
+            make_comps(clips, path, frames=frames, force_bt709=force_bt709, **comp_args)
+            return
+
+        start = time.perf_counter()
+        self._write_comps(clips, frames, Path(path), force_bt709, workers)
+        logger.info(f"Wrote {len(frames)} comps in {time.perf_counter() - start:.2f}s")
+
+
+    @staticmethod
+    def select_comp_frames(
+        clip: vs.VideoNode, num_frames: int, scene_threshold: float = 0.1, seed: int | None = None
+    ) -> list[int]:
+        """
+        Pick frames to compare, balanced between picture types (I, P and B), scenes and dark, mid and bright frames.
+        Picture types, scene changes and brightness are read in a single pass over a downscaled proxy of the clip.
+        A scene is only picked again once every scene with the same picture type and brightness was picked.
+
+        :param clip:                Clip to pick frames from, usually the encoded file
+        :param num_frames:          Number of frames to pick
+        :param scene_threshold:     Average difference with the previous frame for a scene change. Defaults to 0.1.
+        :param seed:                Seed of the random choices. Defaults to None.
+
+        :return:                    Sorted frame numbers
+        """
+        proxy = clip.resize.Bilinear(
+            max(clip.width // 8, 16) if clip.width else 160, max(clip.height // 8, 16) if clip.height else 90,
+            format=vs.GRAY8
+        )
+        proxy = proxy.std.PlaneStats(proxy[0] + proxy)
+
+        # (picture type, brightness) -> scene -> frames
+        strata = dict[tuple[str, int], dict[int, list[int]]]()
+        scene = 0
+
+        for n, f in enumerate(proxy.frames(close=True)):
+            if n and f.props["PlaneStatsDiff"] > scene_threshold:  # type: ignore[operator]
+                scene += 1
+
+            pict_type = f.props.get("_PictType", b"?")
+            pict_type = pict_type.decode() if isinstance(pict_type, bytes) else str(pict_type)
+            brightness = min(int(f.props["PlaneStatsAverage"] * 3), 2)  # type: ignore[operator]
+
+            strata.setdefault((pict_type, brightness), {}).setdefault(scene, []).append(n)
+
+        rng = random.Random(seed)
+        remaining = {key: list(scenes) for key, scenes in strata.items()}
+        frames = set[int]()
+
+        while len(frames) < num_frames and any(strata.values()):
+            for key in rng.sample(list(strata), len(strata)):
+                if len(frames) >= num_frames:
+                    break
+                if not strata[key]:
+                    continue
+
+                if not remaining[key]:
+                    remaining[key] = list(strata[key])
+
+                scene = remaining[key].pop(rng.randrange(len(remaining[key])))
+                scene_frames = strata[key][scene]
+                frames.add(scene_frames.pop(rng.randrange(len(scene_frames))))
+
+                if not scene_frames:
+                    del strata[key][scene]
+                    if scene in remaining[key]:
+                        remaining[key].remove(scene)
+
+        return sorted(frames)
+
+
+    @staticmethod
+    def _write_comps(
+        clips: dict[str, vs.VideoNode], frames: list[int], path: Path, force_bt709: bool, workers: int | None
+    ) -> None:
+        rgb_clips = dict[str, vs.VideoNode]()
+
+        for name, clip in clips.items():
+            # variable format clips have no format, their frames are converted with the matrix of their props
+            if clip.format is None or clip.format.id != vs.RGB24:
+                is_yuv = clip.format is not None and clip.format.color_family == vs.YUV
+                clip = clip.resize.Bicubic(
+                    format=vs.RGB24, matrix_in_s="709" if force_bt709 and is_yuv else None,
+                    dither_type="error_diffusion"
+                )
+            rgb_clips[name] = clip
+            (path / name).mkdir(parents=True, exist_ok=True)
+
+        # requested frames and frames waiting to be written are bounded to limit the memory usage
+        window = max(core.num_threads, 1) * 2
+        requests = deque[tuple[Path, Future[vs.VideoFrame]]]()
+        writes = deque[Future[None]]()
+
+        with ThreadPoolExecutor(workers, thread_name_prefix="UtilsTooling.make_comp") as executor:
+            def _write_next() -> None:
+                png_path, request = requests.popleft()
+                writes.append(executor.submit(_write_png, png_path, request.result()))
+
+                if len(writes) > window:
+                    writes.popleft().result()
+
+            for n in frames:
+                for name, clip in rgb_clips.items():
+                    requests.append((path / name / f"{n}.png", clip.get_frame_async(n)))
+
+                    if len(requests) > window:
+                        _write_next()
+
+            while requests:
+                _write_next()
+
+            for write in writes:
+                write.result()
 
 
-    def generate_keyframes(self, mode: SceneChangeMode = SceneChangeMode.WWXD_SCXVID_UNION) -> None:
+    def generate_keyframes(
+        self, mode: SceneChangeMode = SceneChangeMode.WWXD_SCXVID_UNION, height: int | None = 360, resume: bool = True,
+        episode: EpisodeInfo[Any] | None = None
+    ) -> None:
         """
         Generate Aegisub compatible keyframes.
+        Keyframes are appended to the file while the clip is analysed. If the generation is interrupted, the next call
+        resumes from the last analysed frame of the same file. Once complete, keyframes are generated again by the
+        next call.
+
+        If an episode is given, its OP and ED are not analysed. Their keyframes are computed once from the NCOP/NCED
+        (or from the OP/ED itself if there is no NC) and cached in ``~/.cache/svsfunc/keyframes`` by content, so that
+        every episode using the same OP/ED reuses them.
 
         :param mode:            Scene change detection mode. Defaults to WWXD or SCXVID.
-        :param delete_index:    Delete index file generated when indexing `file.name_file_final`. Defaults to True.
+        :param height:          Height of the proxy clip that is analysed, None to analyse the full clip.
+                                Defaults to 360.
+        :param resume:          Resume an interrupted generation. Defaults to True.
+        :param episode:         Episode with the OP/ED ranges of the clip, and optionally its NCOP/NCED.
+
+        :raises ValueError:     If an OP/ED range is outside of the clip.
         """
         if self.file.name_file_final.exists():
             logger.info("Generating keyframes from encoded file")
-            clip = LSMAS(cache=False).index(self.file.name_file_final.to_str())
+            clip = LSMAS().index(self.file.name_file_final.to_str())
+            source = file_fingerprint(self.file.name_file_final)
         else:
             logger.info("Generating keyframes from filtered clip")
             clip = self.clip
+            source = "clip"
+
+        segments = self._get_keyframes_segments(clip, episode, mode, height) if episode else []
+
+        kf_path = Path(f"{self.file.name_file_final.to_str()}_keyframes.txt")
+        progress_path = kf_path.with_name(kf_path.name + ".progress")
+        state = ":".join(map(str, [
+            source, clip.num_frames, int(mode), height, *(f"{s}-{e}" for s, e, _ in segments)
+        ]))
+
+        start = 0
+        if resume and kf_path.exists() and progress_path.exists():
+            saved_state, _, last_frame = progress_path.read_text().rpartition(" ")
+            if saved_state == state and last_frame.isdigit():
+                start = int(last_frame) + 1
+
+        if start >= clip.num_frames:
+            logger.info("Keyframes already generated")
+            progress_path.unlink(True)
+            return
+
+        if start:
+            logger.info(f"Resuming keyframes generation from frame {start}")
+            # drop keyframes written after the last saved progress
+            lines = kf_path.read_text().splitlines(True)
+            kf_path.write_text("".join(
+                line for line in lines if not line[:1].isdigit() or int(line.split(" ", 1)[0]) < start
+            ))
+        else:
+            kf_path.write_text("# WWXD log file, using qpfile format\n\n")
+
+        def _save_progress(n: int) -> None:
+            tmp_path = progress_path.with_name(progress_path.name + ".tmp")
+            tmp_path.write_text(f"{state} {n}")
+            tmp_path.replace(progress_path)
+
+        pos = start
+
+        with kf_path.open("a") as f:
+            # a sentinel segment after the last frame analyses the end of the clip
+            for seg_start, seg_end, seg_keyframes in [*segments, (clip.num_frames - 1, clip.num_frames - 1, [])]:
+                if seg_end < pos:
+                    continue
+
+                # the first frame of a segment is analysed with the episode, the frame before the first one is
+                # analysed again so that stateful detectors see the previous frame
+                if pos <= seg_start:
+                    for n, scene_change in _iter_scene_changes(clip, mode, max(pos - 1, 0), height, seg_start):
+                        if scene_change and n >= max(pos, 1):
+                            f.write(f"{n} I -1\n")
+
+                        if n % 1000 == 999:
+                            f.flush()
+                            _save_progress(n)
+
+                f.writelines(f"{n} I -1\n" for n in seg_keyframes if n >= pos)
+                f.flush()
+                _save_progress(seg_end)
+                pos = seg_end + 1
+
+        # the generation is complete, the next call generates the keyframes again (e.g. after a new encode)
+        progress_path.unlink(True)
+
+
+    @staticmethod
+    def _get_keyframes_segments(
+        clip: vs.VideoNode, episode: EpisodeInfo[Any], mode: SceneChangeMode, height: int | None
+    ) -> list[tuple[int, int, list[int]]]:
+        segments = list[tuple[int, int, list[int]]]()
+
+        for name, frame_range, nc in [("OP", episode.op_range, episode.ncop), ("ED", episode.ed_range, episode.nced)]:
+            if frame_range is None:
+                continue
+
+            seg_start, seg_end = frame_range
+            if not 0 <= seg_start <= seg_end < clip.num_frames:
+                raise ValueError(f"UtilsTooling.generate_keyframes: {name} range {frame_range} is outside of the clip.")
+
+            segment = nc if nc is not None else trim(clip, frame_range)
+            keyframes = [
+                seg_start + n for n in _get_segment_keyframes(segment, mode, height) if n <= seg_end - seg_start
+            ]
+            segments.append((seg_start, seg_end, keyframes))
+
+        segments.sort()
+
+        if len(segments) == 2 and segments[0][1] >= segments[1][0]:
+            raise ValueError("UtilsTooling.generate_keyframes: OP and ED ranges overlap.")
+
+        return segments
+
+
+_segment_keyframes = dict[str, list[int]]()
+
+
+def _get_segment_keyframes(segment: vs.VideoNode, mode: SceneChangeMode, height: int | None) -> list[int]:
+    # keyframes of a segment (except its first frame), cached by a hash of sampled frames of the segment
+    proxy = segment.resize.Bilinear(64, 36, format=vs.GRAY8)
+    digest = blake2b(f"{segment.num_frames}:{int(mode)}:{height}".encode(), digest_size=16)
+
+    for n in sorted({i * (proxy.num_frames - 1) // 4 for i in range(5)}):
+        with proxy.get_frame(n) as frame:
+            digest.update(frame[0].tobytes())  # type: ignore[index]
+
+    key = digest.hexdigest()
+
+    if key in _segment_keyframes:
+        return _segment_keyframes[key]
+
+    cache_file = Path.home() / ".cache" / "svsfunc" / "keyframes" / f"{key}.txt"
+
+    try:
+        keyframes = [int(line) for line in cache_file.read_text().split()]
+    except (OSError, ValueError):
+        logger.info(f"Analysing segment of {segment.num_frames} frames")
+        keyframes = [n for n, scene_change in _iter_scene_changes(segment, mode, 0, height) if scene_change and n]
+
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text("\n".join(map(str, keyframes)))
+        except OSError:
+            pass
+
+    _segment_keyframes[key] = keyframes
+
+    return keyframes
+
+
+def _iter_scene_changes(
+    clip: vs.VideoNode, mode: SceneChangeMode, start: int = 0, height: int | None = 360, end: int | None = None
+) -> Iterator[tuple[int, bool]]:
+    """
+    Analyse a downscaled proxy of a clip from `start` to `end` (inclusive) and yield whether every frame is a scene
+    change, in order.
+    """
+    stats = mode.prepare_clip(clip, height)
+    check = mode.check_cb()
+
+    # frames are requested ahead so that they are decoded in parallel, the detectors still get them in order
+    window = max(core.num_threads, 1) * 2
+    requests = deque[tuple[int, Future[vs.VideoFrame]]]()
+
+    for n in range(start, stats.num_frames if end is None else end + 1):
+        requests.append((n, stats.get_frame_async(n)))
 
-        kf = Keyframes.from_clip(clip, mode)
+        if len(requests) > window:
+            req_n, request = requests.popleft()
+            with request.result() as frame:
+                yield req_n, check(frame)
 
-        with open(f"{self.file.name_file_final.to_str()}_keyframes.txt", "w") as f:
-            f.write("# WWXD log file, using qpfile format\n\n")
-            f.writelines([f"{frame} I -1\n" for frame in kf[1:]])
+    while requests:
+        req_n, request = requests.popleft()
+        with request.result() as frame:
+            yield req_n, check(frame)
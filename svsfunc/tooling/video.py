@@ -2,15 +2,24 @@ from __future__ import annotations
 
 __all__ = ["VideoTooling"]
 
-from typing import Any, Callable, TypeAlias, Union
+import copy
+import shutil
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Any, Callable, Sequence, TypeAlias, Union
 
-from vardautomation import FFV1, X264, X265, NVEncCLossless, VPath, logger
-from vstools import vs
+from vardautomation import FFV1, X264, X265, MatroskaFile, NVEncCLossless, VPath, logger
+from vstools import Keyframes, SceneChangeMode, vs
 
 from .base import BaseEncoder
 
 VideoEncoder: TypeAlias = Union[X264, X265]
 VideoLosslessEncoder: TypeAlias = Union[FFV1, NVEncCLossless]
+Zones: TypeAlias = dict[tuple[int, int], dict[str, Any]]
+
+# raw Annex-B bitstreams can be concatenated as is, every chunk starts with its parameter sets and an IDR frame
+_RAW_BITSTREAM_SUFFIXES = {".264", ".h264", ".avc", ".265", ".h265", ".hevc"}
 
 
 class VideoTooling(BaseEncoder):
@@ -19,6 +28,17 @@ class VideoTooling(BaseEncoder):
     v_encoder: VideoEncoder
     v_lossless_encoder: VideoLosslessEncoder | None = None
 
+    v_zones: Zones | None = None
+    _v_encoder_factory: Callable[..., VideoEncoder] | None = None
+
+    chunked: bool = False
+    chunk_workers: int = 1
+    chunk_count: int | None = None
+    chunk_min_length: int = 1000
+    chunk_mode: SceneChangeMode = SceneChangeMode.WWXD
+    chunk_height: int | None = 360
+    chunk_keyframes: list[int] | None = None
+
     qp_file: vs.VideoNode | None = None
     post_filterchain_func: Callable[[VPath], vs.VideoNode] | None = None
 
@@ -27,7 +47,7 @@ class VideoTooling(BaseEncoder):
         encoder: type[VideoEncoder],
         settings: str | list[str] | dict[str, Any],
         resumable: bool = False,
-        zones: dict[tuple[int, int], dict[str, Any]] | None = None,
+        zones: Zones | None = None,
         prefetch: int = 0,
         qp_file: bool | vs.VideoNode | None = None,
         **enc_overrides: Any
@@ -47,7 +67,10 @@ class VideoTooling(BaseEncoder):
         if zones is not None and resumable:
             logger.warning("Zones are not shifted when encode is resumed. This may lead to incorrect zones.")
 
-        self.v_encoder = encoder(settings, zones=zones, **enc_overrides)
+        self._v_encoder_factory = partial(encoder, settings, **enc_overrides)
+        self.v_zones = zones
+
+        self.v_encoder = self._v_encoder_factory(zones=zones)
         self.v_encoder.resumable = resumable
         self.v_encoder.prefetch = prefetch
 
@@ -62,6 +85,178 @@ class VideoTooling(BaseEncoder):
             logger.info("Using file.clip_cut for qp_file")
 
 
+    def video_chunks(
+        self, workers: int, chunks: int | None = None, min_length: int = 1000,
+        mode: SceneChangeMode = SceneChangeMode.WWXD, height: int | None = 360,
+        keyframes: Sequence[int] | None = None
+    ) -> None:
+        """
+        Encode the clip in chunks with several encoder processes at the same time. Should be called after
+        :py:meth:`video_encoder`.
+        Chunks are split at scene changes, so that the first frame of every chunk (always an IDR frame) is a keyframe
+        anyway. The chunks are concatenated losslessly when they are all encoded: raw bitstreams (.264/.265/.hevc...)
+        are joined as is, Matroska outputs are appended with mkvmerge.
+
+        Scene changes are detected on the qp_file clip if it is set, otherwise on ``file.clip_cut`` so that the
+        filterchain is not rendered twice. Zones are split with the clip and the qpfile of every chunk is written from
+        the scene changes. If the video encoder is resumable, the chunks that were completely encoded are kept when
+        the encode is started again.
+
+        :param workers:         Number of chunks encoded at the same time. Settings such as ``--threads`` or
+                                ``--pools`` should be lowered so that the encoders share the CPUs.
+        :param chunks:          Number of chunks to split the clip in, defaults to 4 times the number of workers.
+                                Less chunks are used if there are not enough scene changes.
+        :param min_length:      Minimum number of frames of a chunk, defaults to 1000
+        :param mode:            Scene change detection mode used to find the split points. Defaults to WWXD.
+        :param height:          Height of the proxy clip used to detect the scene changes, defaults to 360
+        :param keyframes:       Keyframes of the clip (e.g. from a previous scene change detection), also used for
+                                the qpfile. If None, the scene changes are detected with ``Keyframes.from_clip``.
+
+        :raises ValueError:     If no video encoder is set, if workers, chunks or min_length is lower than 1,
+                                or if the output of the encoder cannot be concatenated.
+        """
+        if self._v_encoder_factory is None:
+            raise ValueError("VideoTooling.video_chunks: video_encoder must be called first.")
+        if workers < 1:
+            raise ValueError(f"VideoTooling.video_chunks: workers must be greater than 0, got {workers}.")
+        if chunks is not None and chunks < 1:
+            raise ValueError(f"VideoTooling.video_chunks: chunks must be greater than 0, got {chunks}.")
+        if min_length < 1:
+            raise ValueError(f"VideoTooling.video_chunks: min_length must be greater than 0, got {min_length}.")
+
+        suffix = self.file.name_clip_output.suffix.lower()
+        if suffix not in _RAW_BITSTREAM_SUFFIXES and suffix != ".mkv":
+            raise ValueError(
+                f"VideoTooling.video_chunks: cannot concatenate \"{suffix}\" files, use a raw bitstream or mkv output."
+            )
+
+        self.chunked = True
+        self.chunk_workers = workers
+        self.chunk_count = chunks
+        self.chunk_min_length = min_length
+        self.chunk_mode = mode
+        self.chunk_height = height
+        self.chunk_keyframes = None if keyframes is None else list(keyframes)
+
+        logger.info(f"Chunked video encode: {workers} workers")
+
+
+    def encode_video_chunks(self) -> None:
+        """
+        Encode the clip in chunks as configured by :py:meth:`video_chunks`, then concatenate the chunks to
+        ``file.name_clip_output``. Called by :py:meth:`svsfunc.encode.Encoder.run`.
+        """
+        output = self.file.name_clip_output
+        resume = self.v_encoder.resumable
+
+        if self.qp_file is not None and self.qp_file.num_frames != self.clip.num_frames:
+            raise ValueError("VideoTooling.encode_video_chunks: qp_file must have the same length as the clip.")
+        clip_cut = self.file.clip_cut
+        if self.qp_file is None and self.chunk_keyframes is None and clip_cut.num_frames != self.clip.num_frames:
+            raise ValueError("VideoTooling.encode_video_chunks: file.clip_cut must have the same length as the clip.")
+
+        keyframes = self._get_chunk_keyframes(resume)
+        ranges = _split_chunks(
+            self.clip.num_frames, keyframes, self.chunk_count or self.chunk_workers * 4, self.chunk_min_length
+        )
+        logger.info(f"Encoding {len(ranges)} chunks with {self.chunk_workers} workers")
+
+        parts = [output.append_stem(f"_chunk_{i:03d}_{start}-{end}") for i, (start, end) in enumerate(ranges)]
+        done = 0
+
+        with ThreadPoolExecutor(self.chunk_workers) as executor:
+            futures = [
+                executor.submit(self._encode_chunk, part, start, end, keyframes, resume)
+                for part, (start, end) in zip(parts, ranges)
+            ]
+
+            for future in as_completed(futures):
+                future.result()
+                done += 1
+                logger.info(f"Chunks encoded: {done}/{len(ranges)}")
+
+        logger.info("Concatenating the chunks...")
+        tmp_path = output.append_stem("_tmp")
+
+        if output.suffix.lower() in _RAW_BITSTREAM_SUFFIXES:
+            with tmp_path.open("wb") as out:
+                for part in parts:
+                    with part.open("rb") as f:
+                        shutil.copyfileobj(f, out, 1 << 20)
+        else:
+            MatroskaFile(tmp_path, None, "--quiet").append_to(parts)
+
+        tmp_path.replace(output)
+
+        for part in parts:
+            part.unlink(missing_ok=True)
+            _chunk_marker(part).unlink(missing_ok=True)
+        self._get_chunk_keyframes_path().unlink(missing_ok=True)
+
+
+    def _get_chunk_keyframes_path(self) -> VPath:
+        return self.file.name_clip_output.append_stem(f"_chunks_{self.clip.num_frames}").with_suffix(".txt")
+
+
+    def _get_chunk_keyframes(self, resume: bool) -> list[int]:
+        if self.chunk_keyframes is not None:
+            return self.chunk_keyframes
+
+        # the keyframes are saved so that a resumed encode is split at the same frames
+        kf_path = self._get_chunk_keyframes_path()
+        if resume and kf_path.exists():
+            return Keyframes.from_file(kf_path)
+
+        # the scene changes are also used for the qpfile, so they are detected on the qp_file clip if it is set,
+        # otherwise on the source clip that has the same frames without rendering the filterchain
+        logger.info("Detecting scene changes to split the clip...")
+        keyframes = Keyframes.from_clip(
+            self.file.clip_cut if self.qp_file is None else self.qp_file, self.chunk_mode, self.chunk_height
+        )
+        keyframes.to_file(kf_path, force=True)
+
+        return keyframes
+
+
+    def _encode_chunk(self, part: VPath, start: int, end: int, keyframes: list[int], resume: bool) -> None:
+        marker = _chunk_marker(part)
+
+        if resume and marker.exists() and part.exists():
+            logger.info(f"Chunk {start}-{end} already encoded")
+            return
+
+        marker.unlink(missing_ok=True)
+
+        assert self._v_encoder_factory
+        # progress bars of the encoders running at the same time would be mixed
+        encoder = self._v_encoder_factory(zones=_shift_zones(self.v_zones, start, end), progress_update=None)
+        # the chunks are the resume points, a chunk that was interrupted is encoded again
+        encoder.resumable = False
+        encoder.prefetch = self.v_encoder.prefetch
+
+        file = copy.copy(self.file)
+        file.name_clip_output = part
+
+        # the qpfile of the chunk is written from the keyframes of the split, instead of detecting the scene changes
+        # again in every chunk
+        qpfile = None
+        if self.qp_file is not None:
+            qpfile = part.append_stem("_qpfile").with_suffix(".log")
+            qpfile.write_text("".join(f"{n - start} K\n" for n in keyframes if start <= n <= end))
+            encoder.params.extend(["--qpfile", qpfile.to_str()])
+
+        try:
+            encoder.run_enc(self.clip[start:end + 1], file)
+        finally:
+            if qpfile is not None:
+                qpfile.unlink(missing_ok=True)
+
+        if not part.exists():
+            raise ValueError(f"VideoTooling.encode_video_chunks: chunk {start}-{end} was not encoded.")
+
+        marker.touch()
+
+
     def video_lossless_encoder(
         self, lossless_encoder: type[VideoLosslessEncoder],
         post_filterchain_func: Callable[[VPath], vs.VideoNode] | None = None,
@@ -83,3 +278,39 @@ class VideoTooling(BaseEncoder):
         self.post_filterchain_func = post_filterchain_func
         if self.post_filterchain_func:
             logger.info("Post-filtering function set.")
+
+
+def _chunk_marker(part: VPath) -> VPath:
+    return part.with_name(part.name + ".done")
+
+
+def _split_chunks(num_frames: int, keyframes: Sequence[int], chunks: int, min_length: int) -> list[tuple[int, int]]:
+    """Split a clip in ranges (inclusive) of about the same length, starting at the keyframes closest to the splits."""
+    cuts = sorted({n for n in keyframes if min_length <= n <= num_frames - min_length})
+    bounds = [0]
+
+    for i in range(1, chunks):
+        target = num_frames * i // chunks
+        idx = bisect_left(cuts, target)
+
+        candidates = [n for n in cuts[max(idx - 1, 0):idx + 1] if n >= bounds[-1] + min_length]
+        if candidates:
+            bounds.append(min(candidates, key=lambda n: abs(n - target)))
+
+    bounds.append(num_frames)
+
+    return [(start, end - 1) for start, end in zip(bounds, bounds[1:])]
+
+
+def _shift_zones(zones: Zones | None, start: int, end: int) -> Zones | None:
+    """Keep the zones (inclusive) inside a chunk, relative to the first frame of the chunk."""
+    if not zones:
+        return None
+
+    shifted = {
+        (max(zone_start, start) - start, min(zone_end, end) - start): settings
+        for (zone_start, zone_end), settings in zones.items()
+        if zone_start <= end and zone_end >= start
+    }
+
+    return shifted or None
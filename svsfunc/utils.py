@@ -1,27 +1,44 @@
 from __future__ import annotations
 
+from array import array
 from functools import partial
 from pathlib import Path
 from typing import Any, Callable, NoReturn, TypeVar
 
 from vstools import (
-    ChromaLocation, ColorRange, FrameRangeN, FrameRangesN, Matrix, Primaries, Transfer, get_prop, normalize_ranges,
-    to_arr, vs, remap_frames
+    ChromaLocation, ColorRange, FrameRangeN, FrameRangesN, Matrix, Primaries, PropEnum, Transfer, core,
+    normalize_ranges, to_arr, vs
 )
 
 from .custom_types import FramePropKey
 
 __all__ = [
-    "trim", "write_props",
+    "trim", "write_props", "decode_prop",
     "ensure_path", "normalize_list"
 ]
 
 T = TypeVar("T")
 
+# above this number of ranges, a single frame map is cheaper than splicing every range
+_MAX_SPLICE_RANGES = 256
+
+# label and table of the printable values of every supported prop, built once
+_PROP_TABLES: dict[FramePropKey, tuple[str, type[PropEnum] | None, dict[Any, str]]] = {
+    "_PictType": ("Picture Type", None, {t: t.decode() for t in (b"I", b"P", b"B")}),
+    **{
+        enum.prop_key: (label, enum, {int(value): value.pretty_string for value in enum})
+        for label, enum in (
+            ("Chroma Location", ChromaLocation), ("Primaries", Primaries), ("Transfer", Transfer),
+            ("Matrix", Matrix), ("Color Range", ColorRange)
+        )
+    }
+}
+
 
 def trim(clip: vs.VideoNode, frame_range: FrameRangeN | FrameRangesN) -> vs.VideoNode:
     """
     Trim clip to keep only selected frames. Ranges are inclusives.
+    Ranges are kept with native Trim/Splice, a frame map is only used if there are a lot of scattered ranges.
 
     :param clip:            Clip to trim
     :param frame_range:     Frames to keep
@@ -34,7 +51,63 @@ def trim(clip: vs.VideoNode, frame_range: FrameRangeN | FrameRangesN) -> vs.Vide
     if not ranges:
         raise ValueError("trim: Cannot trim clip with empty range")
 
-    return remap_frames(clip, ranges)
+    # merge ranges that follow each other so that they can be kept with a single Trim
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start == merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    if len(merged) == 1:
+        start, end = merged[0]
+        return clip[start:end + 1]
+
+    if len(merged) <= _MAX_SPLICE_RANGES:
+        return core.std.Splice([clip[start:end + 1] for start, end in merged])
+
+    frame_map = array("L")
+    for start, end in merged:
+        frame_map.extend(range(start, end + 1))
+
+    return clip.std.BlankClip(length=len(frame_map)).std.FrameEval(lambda n: clip[frame_map[n]], None, clip)
+
+
+def decode_prop(prop: FramePropKey, value: int | bytes | str, label: bool = True) -> str:
+    """
+    Get the printable value of a frame prop supported by :py:func:`write_props`.
+    The printable values are computed once, so this can be called for every frame.
+
+    :param prop:        Name of the frame prop
+    :param value:       Value of the frame prop
+    :param label:       Prepend the name of the prop (e.g. "Matrix: BT.709"), defaults to True
+
+    :raises KeyError:   If the prop is not supported
+    :raises ValueError: If the value is not valid for the prop
+
+    :return:            Printable value of the prop
+    """
+    if prop not in _PROP_TABLES:
+        raise KeyError(f"decode_prop: unsupported prop \"{prop}\".")
+
+    prop_name, enum, table = _PROP_TABLES[prop]
+
+    if (txt := table.get(value)) is None:
+        if enum is not None:
+            txt = enum(value).pretty_string
+        elif isinstance(value, (bytes, str)):
+            txt = value.decode() if isinstance(value, bytes) else value
+        else:
+            raise ValueError(f"decode_prop: invalid value {value!r} for prop \"{prop}\".")
+
+    return f"{prop_name}: {txt}" if label else txt
+
+
+def _read_prop(prop: FramePropKey, f: vs.VideoFrame, n: int) -> str:
+    if (value := f.props.get(prop)) is None:
+        raise KeyError(f"write_props: prop \"{prop}\" not found in frame {n}.")
+
+    return decode_prop(prop, value)  # type: ignore[arg-type]
 
 
 def write_props(
@@ -54,35 +127,70 @@ def write_props(
 
     :return:            Clip with frame props
     """
-    prop_map: dict[FramePropKey, tuple[str, Callable[[Any], str]]] = {
-        "_PictType": ("Picture Type", lambda x: x.decode()),
-        "_ChromaLocation": ("Chroma Location", lambda x: ChromaLocation(x).pretty_string),
-        "_Primaries": ("Primaries", lambda x: Primaries(x).pretty_string),
-        "_Transfer": ("Transfer", lambda x: Transfer(x).pretty_string),
-        "_Matrix": ("Matrix", lambda x: Matrix(x).pretty_string),
-        "_ColorRange": ("Color Range", lambda x: ColorRange(x).pretty_string)
-    }
+    props = to_arr(props or "_PictType")
 
-    def _get_props(n: int, f: vs.VideoFrame, clip: vs.VideoNode, props: list[FramePropKey]) -> vs.VideoNode:
-        txt = f"{'Frame Info' if clip_name is None else clip_name}\nFrame Number: {n}"
+    for prop in props:
+        if prop not in _PROP_TABLES:
+            raise KeyError(f"write_props: unsupported prop \"{prop}\".")
 
-        for prop in props:
-            if prop not in prop_map:
-                raise KeyError(f"write_props: unsupported prop \"{prop}\".")
-            if prop not in f.props:
-                raise KeyError(f"write_props: prop \"{prop}\" not found in frame {n}.")
+    header = 'Frame Info' if clip_name is None else clip_name
+    lines = [*header.split("\n"), f"Frame Number: {clip.num_frames - 1}", *(_PROP_TABLES[p][0] + ": " for p in props)]
 
-            prop_name, convert_func = prop_map[prop]
-            prop_value: bytes | int = get_prop(f, prop, bytes if prop == "_PictType" else int)
+    # the layered rendering only gives the same output if lines are not wrapped nor moved by the alignment
+    if alignment == 7 and all(lines) and clip.width >= (max(len(line) for line in lines) + 24) * 8 * scale:
+        out = _write_props_layers(clip, props, header, scale)
+    else:
+        out = _write_props_eval(clip, props, header, alignment, scale)
+
+    return out.std.SetFrameProp("Name", data=clip_name) if clip_name else out
 
-            txt += f"\n{prop_name}: {convert_func(prop_value)}"
+
+def _write_props_eval(
+    clip: vs.VideoNode, props: list[FramePropKey], header: str, alignment: int, scale: int
+) -> vs.VideoNode:
+    def _get_props(n: int, f: vs.VideoFrame) -> vs.VideoNode:
+        txt = "\n".join([f"{header}\nFrame Number: {n}", *(_read_prop(prop, f, n) for prop in props)])
 
         return clip.text.Text(txt, alignment=alignment, scale=scale)
 
-    f = partial(_get_props, clip=clip, props=to_arr(props or "_PictType"))
-    out = clip.std.FrameEval(f, prop_src=clip)
+    return clip.std.FrameEval(_get_props, prop_src=clip)
 
-    return out.std.SetFrameProp("Name", data=clip_name) if clip_name else out
+
+def _write_props_layers(clip: vs.VideoNode, props: list[FramePropKey], header: str, scale: int) -> vs.VideoNode:
+    # The text is drawn in layers: one per prop line, one per digit of the frame number and one for the static text.
+    # Every character cell is fully painted by the text plugin, so a layer can be moved to its line and column with
+    # spaces and lines containing a single space (painted over by the layers drawn after). Layers are drawn from the
+    # last line/column to the first. Every layer only uses a few Text nodes, created once per value.
+    number_line = header.count("\n") + 1
+    number_col = len("Frame Number: ")
+
+    def _layer(
+        clip: vs.VideoNode, prefix: str, get_text: Callable[..., str | None], prop_src: vs.VideoNode | None = None
+    ) -> vs.VideoNode:
+        nodes = dict[str, vs.VideoNode]()
+
+        def _select(n: int, f: vs.VideoFrame | None = None) -> vs.VideoNode:
+            if (txt := get_text(f, n) if prop_src else get_text(n)) is None:
+                return clip
+            if txt not in nodes:
+                nodes[txt] = clip.text.Text(prefix + txt, alignment=7, scale=scale)
+            return nodes[txt]
+
+        return clip.std.FrameEval(_select, prop_src=prop_src)
+
+    def _digit(col: int, n: int) -> str | None:
+        digits = str(n)
+        return digits[col] if col < len(digits) else None
+
+    out = clip
+
+    for i, prop in reversed(list(enumerate(props))):
+        out = _layer(out, " \n" * (number_line + 1 + i), partial(_read_prop, prop), clip)
+
+    for col in reversed(range(len(str(max(clip.num_frames - 1, 0))))):
+        out = _layer(out, " \n" * number_line + " " * (number_col + col), partial(_digit, col))
+
+    return out.text.Text(f"{header}\nFrame Number:", alignment=7, scale=scale)
 
 
 def ensure_path(path: str | Path, source: str = "ensure_path") -> Path:
@@ -0,0 +1,466 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Literal
+
+from .custom_types import PathLike
+from .indexer import EpisodeInfo
+from .parse import HasEpisode
+
+__all__ = ["WorkItem", "Lease", "WorkQueue"]
+
+WorkStatus = Literal["pending", "leased", "done", "failed"]
+
+
+@dataclass
+class WorkItem:
+    """Job of a work queue: an episode or a range of frames of an episode"""
+
+    job_id: str
+    """Unique name of the job"""
+
+    ep_num: int
+    """Episode number (one-based) in the parser"""
+
+    frame_range: tuple[int, int] | None = None
+    """Frames to process (inclusive). None for the whole episode."""
+
+    attempts: int = 0
+    """Number of times the job was leased"""
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> WorkItem:
+        frame_range = data.get("frame_range")
+        return cls(data["job_id"], data["ep_num"], tuple(frame_range) if frame_range else None, data["attempts"])
+
+
+def _write_json(path: Path, data: Any) -> None:
+    # write then rename, so that other nodes never read a partial file
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    tmp_path.replace(path)
+
+
+def _read_json(path: Path) -> Any | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+class Lease:
+    """
+    Exclusive right of a node to process a job, until it expires. The lease must be renewed with :py:meth:`heartbeat`
+    (or :py:meth:`start_heartbeat`) before it expires, otherwise another node can take the job.
+    """
+
+    queue: WorkQueue
+    item: WorkItem
+    node: str
+    expires: float
+
+    _generation: int
+    _stop_heartbeat: threading.Event | None
+
+    def __init__(self, queue: WorkQueue, item: WorkItem, node: str, generation: int, expires: float) -> None:
+        self.queue = queue
+        self.item = item
+        self.node = node
+        self.expires = expires
+        self._generation = generation
+        self._stop_heartbeat = None
+
+
+    @property
+    def lost(self) -> bool:
+        """
+        Whether the lease expired or was taken by another node.
+        """
+        current = self.queue._current_lease(self.item.job_id)
+        return current is None or current[0] != self._generation or time.time() > self.expires
+
+
+    def heartbeat(self) -> bool:
+        """
+        Renew the lease.
+
+        :return:    False if the lease was lost (expired or taken by another node)
+        """
+        if self.lost:
+            return False
+
+        self.expires = time.time() + self.queue.lease_duration
+        lease_path = self.queue._lease_path(self.item.job_id, self._generation)
+        _write_json(lease_path, dict(node=self.node, expires=self.expires))
+
+        return True
+
+
+    def start_heartbeat(self, interval: float | None = None) -> None:
+        """
+        Renew the lease in a background thread until the job is completed, failed or released.
+
+        :param interval:    Time between two renewals in seconds. Defaults to a third of the lease duration.
+        """
+        if self._stop_heartbeat is not None:
+            return
+
+        stop = self._stop_heartbeat = threading.Event()
+        interval = self.queue.lease_duration / 3 if interval is None else interval
+
+        def _beat() -> None:
+            while not stop.wait(interval):
+                if not self.heartbeat():
+                    break
+
+        threading.Thread(target=_beat, name=f"Lease.heartbeat.{self.item.job_id}", daemon=True).start()
+
+
+    def complete(self, output: Any = None) -> bool:
+        """
+        Mark the job as done. Nothing is written if the lease was lost, since another node may be processing the job.
+
+        :param output:      Result of the job saved in the queue (e.g. path to the encoded file), must be JSON
+                            serializable
+
+        :return:            False if the lease was lost (expired or taken by another node)
+        """
+        if self.lost:
+            self.release()
+            return False
+
+        _write_json(self.queue._done_path(self.item.job_id), dict(node=self.node, output=output, time=time.time()))
+        self.release()
+
+        return True
+
+
+    def fail(self, error: str) -> None:
+        """
+        Release the job after a failure. It will be leased again, or marked as failed if it was leased too many times.
+
+        :param error:       Description of the error
+        """
+        if self.item.attempts >= self.queue.max_attempts and not self.lost:
+            _write_json(self.queue._failed_path(self.item.job_id), dict(node=self.node, error=error, time=time.time()))
+
+        self.release()
+
+
+    def release(self) -> None:
+        """
+        Give up the lease without completing the job, so that another node can take it.
+        """
+        if self._stop_heartbeat is not None:
+            self._stop_heartbeat.set()
+
+        # the lease file is kept (as expired) so that the generation of the next lease is always greater
+        if not self.lost:
+            _write_json(self.queue._lease_path(self.item.job_id, self._generation), dict(node=self.node, expires=0))
+
+
+    def __enter__(self) -> Lease:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.release()
+
+
+class WorkQueue:
+    """
+    Queue of episodes (or ranges of episodes) shared by several render nodes through a shared folder.
+    No service is needed: a node takes a job by creating the lease file of the next generation of the job, which fails
+    if another node already created it. Only the lease of the last generation is valid. Leases expire if they are not
+    renewed (e.g. the node crashed) and the job is then taken by another node.
+
+    The folder contains ``jobs/`` (one file per job), ``leases/``, ``done/`` and ``failed/``. Clocks of the nodes
+    must be synchronized, as lease expiry times are compared between nodes.
+    """
+
+    folder: Path
+    lease_duration: float
+    max_attempts: int
+
+    def __init__(self, folder: PathLike, lease_duration: float = 300.0, max_attempts: int = 3) -> None:
+        """
+        :param folder:          Shared folder of the queue, created if needed
+        :param lease_duration:  Time in seconds after which a lease that was not renewed expires. Defaults to 300
+        :param max_attempts:    Number of times a job can be leased before being marked as failed. Defaults to 3
+
+        :raises ValueError:     If lease_duration is not positive or max_attempts is lower than 1
+        """
+        if lease_duration <= 0:
+            raise ValueError(f"WorkQueue: lease_duration must be positive, got {lease_duration}.")
+        if max_attempts < 1:
+            raise ValueError(f"WorkQueue: max_attempts must be greater than 0, got {max_attempts}.")
+
+        self.folder = Path(folder)
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+
+        for sub_folder in ["jobs", "leases", "done", "failed"]:
+            (self.folder / sub_folder).mkdir(parents=True, exist_ok=True)
+
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.folder / "jobs" / f"{job_id}.json"
+
+    def _lease_path(self, job_id: str, generation: int) -> Path:
+        return self.folder / "leases" / f"{job_id}.{generation:06d}.lease"
+
+    def _current_lease(self, job_id: str) -> tuple[int, dict[str, Any]] | None:
+        # generation and content of the last lease of a job
+        generations = [
+            int(path.name.removesuffix(".lease").rpartition(".")[2])
+            for path in (self.folder / "leases").glob(f"{job_id}.*.lease")
+        ]
+        if not generations:
+            return None
+
+        generation = max(generations)
+        lease_path = self._lease_path(job_id, generation)
+
+        if (content := _read_json(lease_path)) is None:
+            # the file is being written, its node died while writing it or the share failed to read it: the lease
+            # expires after the lease duration from its last write
+            try:
+                content = dict(expires=lease_path.stat().st_mtime + self.lease_duration)
+            except OSError:  # replaced by a newer lease
+                content = dict(expires=0)
+
+        return generation, content
+
+    def _done_path(self, job_id: str) -> Path:
+        return self.folder / "done" / f"{job_id}.json"
+
+    def _failed_path(self, job_id: str) -> Path:
+        return self.folder / "failed" / f"{job_id}.json"
+
+
+    def submit(self, ep_num: int, frame_range: tuple[int, int] | None = None) -> WorkItem:
+        """
+        Add a job to the queue. A job that is already in the queue is not added again.
+
+        :param ep_num:          Episode number (one-based)
+        :param frame_range:     Frames of the episode to process (inclusive), None for the whole episode
+
+        :return:                Job of the queue
+        """
+        job_id = f"ep{ep_num:03d}"
+        if frame_range is not None:
+            job_id += f"_{frame_range[0]:06d}-{frame_range[1]:06d}"
+        item = WorkItem(job_id, ep_num, frame_range)
+
+        # the job file is written then linked, so that other nodes never read a partial file and a job that is
+        # already in the queue is not overwritten
+        job_path = self._job_path(job_id)
+        tmp_path = job_path.with_name(f"{job_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(asdict(item)))
+
+        try:
+            os.link(tmp_path, job_path)
+        except FileExistsError:
+            return self.get_item(job_id)
+        finally:
+            tmp_path.unlink(True)
+
+        return item
+
+
+    def submit_episodes(self, parser: HasEpisode[Any], ep_nums: Iterable[int] | None = None) -> list[WorkItem]:
+        """
+        Add a job for every episode of a parser (ParseBD, ParseFolder).
+
+        :param parser:      Parser of the episodes
+        :param ep_nums:     Episodes to add (one-based). If None, every episode is added.
+
+        :return:            Jobs of the episodes
+        """
+        if ep_nums is None:
+            ep_nums = range(1, parser.episode_number + 1)
+
+        return [self.submit(ep_num) for ep_num in ep_nums]
+
+
+    def submit_segments(self, episode: EpisodeInfo[Any]) -> list[WorkItem]:
+        """
+        Add a job for every segment of an episode: the OP, the ED and the parts around them.
+        The episode file is indexed to get its number of frames.
+
+        :param episode:     Episode to split, with its OP/ED ranges
+
+        :return:            Jobs of the segments
+        """
+        num_frames = episode.clip.num_frames
+        cuts = sorted(r for r in [episode.op_range, episode.ed_range] if r is not None)
+
+        segments = list[tuple[int, int]]()
+        start = 0
+
+        for cut_start, cut_end in cuts:
+            if cut_start > start:
+                segments.append((start, cut_start - 1))
+            segments.append((max(cut_start, start), cut_end))
+            start = cut_end + 1
+
+        if start < num_frames:
+            segments.append((start, num_frames - 1))
+
+        return [self.submit(episode.ep_num, segment) for segment in segments]
+
+
+    def get_item(self, job_id: str) -> WorkItem:
+        """
+        Get a job of the queue.
+
+        :param job_id:      Name of the job
+
+        :raises KeyError:   If the job is not in the queue
+
+        :return:            Job
+        """
+        data = _read_json(self._job_path(job_id))
+        if data is None:
+            raise KeyError(f"WorkQueue.get_item: job \"{job_id}\" is not in the queue.")
+
+        return WorkItem.from_dict(data)
+
+
+    def job_ids(self) -> list[str]:
+        """
+        Names of every job of the queue, sorted.
+        """
+        return sorted(path.name.removesuffix(".json") for path in (self.folder / "jobs").glob("*.json"))
+
+
+    def get_status(self, job_id: str) -> WorkStatus:
+        """
+        Status of a job. A job whose lease expired is pending.
+
+        :param job_id:      Name of the job
+
+        :return:            Status of the job
+        """
+        if self._done_path(job_id).exists():
+            return "done"
+        if self._failed_path(job_id).exists():
+            return "failed"
+
+        current = self._current_lease(job_id)
+        if current is not None and current[1].get("expires", 0) >= time.time():
+            return "leased"
+
+        return "pending"
+
+
+    def status(self) -> dict[str, WorkStatus]:
+        """
+        Status of every job of the queue.
+        """
+        return {job_id: self.get_status(job_id) for job_id in self.job_ids()}
+
+
+    def acquire(self, node: str | None = None) -> Lease | None:
+        """
+        Lease the first pending job of the queue.
+        Jobs whose lease expired (e.g. the node crashed) are leased again.
+
+        :param node:    Name of the node, defaults to the host name and the process id
+
+        :return:        Lease of the job, or None if no job is pending
+        """
+        node = node or f"{socket.gethostname()}-{os.getpid()}"
+
+        for job_id in self.job_ids():
+            if self._done_path(job_id).exists() or self._failed_path(job_id).exists():
+                continue
+
+            # the status and the next generation come from the same snapshot: if another node leased the job since,
+            # the lease file of this generation already exists and creating it fails
+            current = self._current_lease(job_id)
+            if current is not None and current[1].get("expires", 0) >= time.time():
+                continue
+
+            generation = 0 if current is None else current[0] + 1
+            lease_path = self._lease_path(job_id, generation)
+            expires = time.time() + self.lease_duration
+
+            try:
+                with lease_path.open("x") as file:
+                    json.dump(dict(node=node, expires=expires), file)
+            except FileExistsError:  # taken by another node
+                continue
+
+            # a lease file of a greater generation was created (and the previous ones removed) between the snapshot
+            # and the creation of this one
+            latest = self._current_lease(job_id)
+            if latest is None or latest[0] != generation:
+                lease_path.unlink(True)
+                continue
+
+            for old_generation in range(generation):
+                self._lease_path(job_id, old_generation).unlink(True)
+
+            # the job was completed by the previous owner between the status check and the lease
+            if self.get_status(job_id) in ("done", "failed"):
+                continue
+
+            item = self.get_item(job_id)
+
+            # the previous leases expired without the job being released (e.g. the node keeps crashing)
+            if item.attempts >= self.max_attempts:
+                _write_json(self._failed_path(job_id), dict(node=node, error="Too many attempts", time=time.time()))
+                continue
+
+            item.attempts += 1
+            _write_json(self._job_path(job_id), asdict(item))
+
+            return Lease(self, item, node, generation, expires)
+
+        return None
+
+
+    def work(
+        self, func: Callable[[WorkItem], Any], node: str | None = None, poll_interval: float = 10.0,
+        wait: bool = False
+    ) -> list[WorkItem]:
+        """
+        Process jobs of the queue until no job is pending. The lease of the current job is renewed in the background.
+        If the function raises an exception, the job is released to be retried (by this node or another).
+
+        :param func:            Function that processes a job. Its return value is saved as the output of the job.
+        :param node:            Name of the node, defaults to the host name and the process id
+        :param poll_interval:   Time in seconds between two checks of the queue when waiting. Defaults to 10
+        :param wait:            Wait for the jobs leased by other nodes to be done (they can expire and be leased
+                                by this node) instead of returning when no job is pending. Defaults to False
+
+        :return:                Jobs done by this node
+        """
+        done = list[WorkItem]()
+
+        while True:
+            lease = self.acquire(node)
+
+            if lease is None:
+                if not wait or "leased" not in self.status().values():
+                    return done
+
+                time.sleep(poll_interval)
+                continue
+
+            lease.start_heartbeat()
+
+            try:
+                output = func(lease.item)
+            except Exception as e:
+                lease.fail(f"{type(e).__name__}: {e}")
+            else:
+                if lease.complete(output):
+                    done.append(lease.item)
@@ -0,0 +1,42 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+
+from svsfunc.indexer import IndexCacheStore, Indexer, IndexerCache, get_index_cache, set_index_cache
+
+
+@dataclass
+class PidIndexer(Indexer[str]):
+    """Writes the pid of the process that created the index file"""
+    _cache = IndexerCache("cachefile", ".idx", None, ())
+
+    def _index_func(self, path: Path, cachefile: str, **kwargs: Any) -> str:  # type: ignore
+        cache_path = Path(cachefile)
+        if not cache_path.exists():
+            cache_path.write_text(str(os.getpid()))
+        return cache_path.read_text()
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> Iterator[IndexCacheStore | None]:
+    previous = get_index_cache()
+    yield set_index_cache(tmp_path / "store")
+    set_index_cache(previous.folder if previous else None, previous.max_size if previous else None)
+
+
+def test_index_batch_process_pool_uses_default_store(tmp_path: Path, store: IndexCacheStore) -> None:
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    paths = [sources / f"{i}.m2ts" for i in range(4)]
+    for i, path in enumerate(paths):
+        path.write_bytes(bytes([i]) * 1024)
+
+    pids = PidIndexer().index_batch(paths, workers=2, pool="process")
+
+    # index files were written by the workers in the store, not next to the sources
+    assert all(int(pid) != os.getpid() for pid in pids)
+    assert sorted(p.name for p in sources.iterdir()) == sorted(p.name for p in paths)
+    assert len(list(store.folder.glob("*.idx"))) == len(paths)
@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import time
+from collections import Counter
+from pathlib import Path
+
+from svsfunc.workqueue import WorkItem, WorkQueue
+
+LEASE_DURATION = 1.0
+
+
+def _node(folder: Path, log: Path, hang: bool) -> None:
+    queue = WorkQueue(folder, lease_duration=LEASE_DURATION)
+
+    def _process(item: WorkItem) -> str:
+        if hang:
+            # the node is killed while it holds the lease
+            (folder / "hanging").write_text(item.job_id)
+            time.sleep(60)
+
+        time.sleep(0.01)
+        with log.open("a") as file:
+            file.write(f"{item.job_id}\n")
+
+        return item.job_id
+
+    queue.work(_process, poll_interval=0.1, wait=True)
+
+
+def test_work_queue_nodes(tmp_path: Path) -> None:
+    folder, log = tmp_path / "queue", tmp_path / "log.txt"
+    queue = WorkQueue(folder, lease_duration=LEASE_DURATION)
+    jobs = [item.job_id for item in (queue.submit(ep_num) for ep_num in range(1, 21))]
+
+    ctx = multiprocessing.get_context("spawn")
+
+    hanging = ctx.Process(target=_node, args=(folder, log, True))
+    hanging.start()
+
+    deadline = time.time() + 30
+    while not (folder / "hanging").exists():
+        assert time.time() < deadline, "the hanging node did not lease a job"
+        time.sleep(0.05)
+
+    nodes = [ctx.Process(target=_node, args=(folder, log, False)) for _ in range(3)]
+    for node in nodes:
+        node.start()
+
+    hanging.kill()
+    hanging.join()
+
+    for node in nodes:
+        node.join(60)
+        assert node.exitcode == 0
+
+    # the job of the killed node was leased again once its lease expired, and every job was done exactly once
+    assert queue.status() == dict.fromkeys(jobs, "done")
+    assert Counter(log.read_text().split()) == Counter(jobs)
+    assert (folder / "hanging").read_text() in jobs
+
+
+def test_unreadable_lease_expires(tmp_path: Path) -> None:
+    queue = WorkQueue(tmp_path, lease_duration=LEASE_DURATION)
+    item = queue.submit(1)
+
+    # a node died between the creation of its lease file and the write of its content
+    lease_path = queue._lease_path(item.job_id, 0)
+    lease_path.touch()
+    assert queue.get_status(item.job_id) == "leased"
+
+    expired = time.time() - 2 * LEASE_DURATION
+    os.utime(lease_path, (expired, expired))
+    assert queue.get_status(item.job_id) == "pending"
+
+    lease = queue.acquire("node")
+    assert lease is not None and lease.item.job_id == item.job_id